@@ -1,10 +1,26 @@
 from data_models.timecube import Timecube
 
 from dataclasses import dataclass, field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable
 import re
 
 
+@dataclass
+class EventSummary:
+    """Totals for a group of events: how many, their minutes, and how many carry each #tag"""
+
+    count: int = 0
+    duration: int = 0  # duration in minutes
+    tag_counts: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, event: "Event"):
+        self.count += 1
+        self.duration += event.duration or 0
+        # An event tagged twice with the same tag still counts once for it
+        for tag in set(event.tags):
+            self.tag_counts[tag] = self.tag_counts.get(tag, 0) + 1
+
+
 @dataclass
 class Event:
 
@@ -34,6 +50,14 @@ class Event:
             tags=re.findall(r"#(\w+)", description)
         )
 
+    @staticmethod
+    def summarize(events: Iterable["Event"]) -> EventSummary:
+        """Count and minutes for the events, and how many carry each tag, in one pass"""
+        summary = EventSummary()
+        for event in events:
+            summary.add(event)
+        return summary
+
     @staticmethod
     def _parse_datetime(date_obj: Dict[str, str]) -> Timecube | None:
         if date_obj.get("dateTime"):
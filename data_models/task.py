@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 import re
 
 from data_models.timecube import Timecube
@@ -203,3 +203,69 @@ class Task:
             done=bool(task_properties["Done"]["checkbox"]),
             last_updated=Timecube.from_date_time_string(notion_response.get("last_edited_time"))
         )
+
+
+def _lazy_relation(field_name: str) -> property:
+    """Property that resolves a deferred relation title the first time it is read"""
+
+    def getter(self: "LazyTask"):
+        if field_name in self._pending_relations:
+            self._resolve_relation(field_name)
+        return self._relation_values.get(field_name)
+
+    def setter(self: "LazyTask", value):
+        self._pending_relations.pop(field_name, None)
+        self._relation_values[field_name] = value
+
+    return property(getter, setter)
+
+
+class LazyTask(Task):
+    """
+    A Task whose relation titles (project, pillar, goal, planned week...) are only looked up when read.
+
+    Relations are deferred with defer_relation, which takes the related page IDs and a callable that turns
+    a list of page IDs into a map of page ID -> title. fill_relation_titles resolves pending relations for
+    many tasks at once from titles fetched in bulk.
+    """
+    # Fields holding a list of titles; every other relation field holds the title of the last related page
+    LIST_RELATION_FIELDS = ("depends_on",)
+
+    depends_on = _lazy_relation("depends_on")
+    project = _lazy_relation("project")
+    subcategory = _lazy_relation("subcategory")
+    pillar = _lazy_relation("pillar")
+    goal = _lazy_relation("goal")
+    planned_week = _lazy_relation("planned_week")
+    planned_month = _lazy_relation("planned_month")
+    planned_quarter = _lazy_relation("planned_quarter")
+
+    def __init__(self, *args, **kwargs):
+        self._relation_values = {}
+        self._pending_relations = {}  # field name -> (related page IDs, title resolver)
+        super().__init__(*args, **kwargs)
+
+    def defer_relation(self, field_name: str, page_ids: List[str], resolve_titles: Callable[[List[str]], Dict[str, str]]):
+        self._pending_relations[field_name] = (page_ids, resolve_titles)
+
+    @property
+    def pending_relations(self) -> Dict[str, List[str]]:
+        """Field name -> related page IDs for every relation not resolved yet"""
+        return {field_name: page_ids for field_name, (page_ids, _) in self._pending_relations.items()}
+
+    def fill_relation_titles(self, titles: Dict[str, str]):
+        """Resolve every pending relation whose pages all have a title in `titles`"""
+        for field_name, (page_ids, _) in list(self._pending_relations.items()):
+            if all(page_id in titles for page_id in page_ids):
+                self._set_relation_titles(field_name, [titles[page_id] for page_id in page_ids])
+
+    def _resolve_relation(self, field_name: str):
+        page_ids, resolve_titles = self._pending_relations[field_name]
+        titles = resolve_titles(page_ids)
+        self._set_relation_titles(field_name, [titles.get(page_id) for page_id in page_ids])
+
+    def _set_relation_titles(self, field_name: str, titles: List[Optional[str]]):
+        if field_name in self.LIST_RELATION_FIELDS:
+            setattr(self, field_name, titles)
+        else:
+            setattr(self, field_name, titles[-1] if titles else None)
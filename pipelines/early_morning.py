@@ -10,10 +10,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from datetime import datetime, timedelta
 from typing import Tuple
 
+from data_models.event import Event
 from data_models.task import Task
 from data_models.timecube import Timecube
 from services.garmin import GarminService
 from services.notion import NotionManager
+from services.notion.async_manager import AsyncNotionManager
 from services.exist import ExistService
 from services.amazing_marvin import AmazingMarvinService
 from services.gcal import GoogleCalendarService
@@ -107,15 +109,17 @@ def sync_exist_data_to_notion_and_am(exist_service: ExistService, notion_service
     """Syncs Exist data to other services."""
     try:
         print("\nFetching data from Exist...")
-        mood = exist_service.get_mood(yesterday)
-        daily_note = exist_service.get_daily_note(yesterday)
-        mobile_screen_time = exist_service.get_mobile_screen_time(yesterday)
+        values = exist_service.get_attributes(["mood", "mood_note", "mobile_screen_min"], yesterday, yesterday)
+        mood = values[yesterday.date_Y_m_d]["mood"]
+        daily_note = values[yesterday.date_Y_m_d]["mood_note"]
+        mobile_screen_time = values[yesterday.date_Y_m_d]["mobile_screen_min"]
         print(f"Retrieved mood: {mood}, screen time: {mobile_screen_time}")
 
         print("Updating Notion...")
-        notion_service.update_daily_note(daily_note, yesterday)
-        notion_service.update_mood_in_daily_tracking_and_mood_tracker(mood, yesterday)
-        notion_service.update_mobile_screen_time(mobile_screen_time, yesterday)
+        with notion_service.coalesced_writes():
+            notion_service.update_daily_note(daily_note, yesterday)
+            notion_service.update_mood_in_daily_tracking_and_mood_tracker(mood, yesterday)
+            notion_service.update_mobile_screen_time(mobile_screen_time, yesterday)
 
         print("Updating Amazing Marvin...")
         am_service.post_daily_note(yesterday, daily_note)
@@ -129,31 +133,14 @@ def sync_gcal_to_exist(gcal_service: GoogleCalendarService, exist_service: Exist
     try:
         print("\nFetching events from Google Calendar...")
         calendar_list = os.getenv("GOOGLE_CALENDARS").split(",")
-        events = []
-        for calendar in calendar_list:
-            events_in_calendar = gcal_service.get_events_for_date(calendar, yesterday)
-            if events_in_calendar:
-                events.extend(events_in_calendar)
+        events = gcal_service.get_events_for_range(calendar_list, yesterday, yesterday)
 
         print(f"Retrieved {len(events)} events")
-        num_events = len(events)
-        time_in_events = sum(event.duration for event in events if event.duration)
+        summary = Event.summarize(events)
+        print(f"Events: {summary.count}, minutes: {summary.duration}, tags: {summary.tag_counts}")
 
         print("Posting data to Exist...")
-        exist_service.post_number_of_events(yesterday, num_events)
-        exist_service.post_time_in_events(yesterday, time_in_events)
-
-        for event in events:
-            if 'activism' in event.tags:
-                exist_service.post_activism(yesterday)
-            if 'coven' in event.tags:
-                exist_service.post_coven(yesterday)
-            if 'family' in event.tags:
-                exist_service.post_family(yesterday)
-            if 'guest' in event.tags:
-                exist_service.post_guest(yesterday)
-            if 'social' in event.tags:
-                exist_service.post_social(yesterday)
+        exist_service.post_event_summary(yesterday, summary)
         print("Successfully synced calendar data")
     except Exception as e:
         print(f"\nError syncing calendar data: {str(e)}")
@@ -174,15 +161,16 @@ def sync_garmin_to_exist(garmin_service: GarminService, exist_service: ExistServ
         print(f"Readiness: {readiness_score}, Stress: {stress}, HRV: {hrv}")
 
         print("Posting data to Exist...")
-        exist_service.post_readiness(yesterday, readiness_score)
-        exist_service.post_stress(yesterday, stress)
-        exist_service.post_hrv(today, hrv)
-
-        for activity in yesterday_activities:
-            if activity.type == 'Running':
-                exist_service.post_run(yesterday)
-            if activity.type == 'Strength':
-                exist_service.post_strength(yesterday)
+        with exist_service.batched_updates():
+            exist_service.post_readiness(yesterday, readiness_score)
+            exist_service.post_stress(yesterday, stress)
+            exist_service.post_hrv(today, hrv)
+
+            for activity in yesterday_activities:
+                if activity.type == 'Running':
+                    exist_service.post_run(yesterday)
+                if activity.type == 'Strength':
+                    exist_service.post_strength(yesterday)
         print("Successfully synced Garmin data")
     except Exception as e:
         print(f"\nError syncing Garmin data: {str(e)}")
@@ -209,16 +197,17 @@ def sync_am_tasks_to_exist(am_service: AmazingMarvinService, exist_service: Exis
                     witchcraft_time += task.duration if task.duration else 0
 
         print("Posting task times to Exist...")
-        exist_service.post_declutter_time(yesterday, declutter_time)
-        exist_service.post_yardwork_time(yesterday, yardwork_time)
-        exist_service.post_cooking_time(yesterday, cooking_time)
-        exist_service.post_witchcraft_time(yesterday, witchcraft_time)
+        with exist_service.batched_updates():
+            exist_service.post_declutter_time(yesterday, declutter_time)
+            exist_service.post_yardwork_time(yesterday, yardwork_time)
+            exist_service.post_cooking_time(yesterday, cooking_time)
+            exist_service.post_witchcraft_time(yesterday, witchcraft_time)
         print("Successfully synced task data")
     except Exception as e:
         print(f"\nError syncing task data: {str(e)}")
 
 
-def sync_garmin_to_notion(garmin_service: GarminService, notion_service: NotionManager, today: Timecube) -> None:
+def sync_garmin_to_notion(garmin_service: GarminService, notion_service: AsyncNotionManager, today: Timecube) -> None:
     """Sync Garmin data to Notion."""
     try:
         print("\nFetching Garmin data for Notion...")
@@ -232,11 +221,12 @@ def sync_garmin_to_notion(garmin_service: GarminService, notion_service: NotionM
         print(f"Retrieved - Weight: {weight}, Body Fat: {body_fat}, Cycle Day: {cycle_day}")
 
         print("Updating Notion...")
-        notion_service.create_sleep_page(sleep_data)
-        notion_service.create_steps_page(today, steps, total_distance)
-        notion_service.create_today_training_page(training_status, readiness_score, description, stress)
-        notion_service.update_weight_bodyfat_hrv_for_today(weight, body_fat, hrv)
-        notion_service.update_menstrual_cycle_for_today(cycle_day)
+        notion_service.run(
+            notion_service.create_sleep_page_async(sleep_data),
+            notion_service.create_steps_page_async(today, steps, total_distance),
+            notion_service.create_today_training_page_async(training_status, readiness_score, description, stress),
+            notion_service.update_weight_bodyfat_hrv_for_today_async(weight, body_fat, hrv),
+            notion_service.update_menstrual_cycle_for_today_async(cycle_day))
         print("Successfully synced Garmin data to Notion")
     except Exception as e:
         print(f"\nError syncing Garmin data to Notion: {str(e)}")
@@ -251,11 +241,13 @@ def sync_am_to_notion_for_today(am_service: AmazingMarvinService, notion_service
         am_tasks = am_service.get_tasks_by_scheduled(today)
         print(f"Found {len(am_tasks)} tasks scheduled in Amazing Marvin for today: {today.date_Y_m_d}")
 
+        # Find the corresponding tasks in Notion in bulk
+        notion_tasks = notion_service.get_tasks_for_compare_and_sync([am_task.am_id for am_task in am_tasks])
+
         # For each task in Amazing Marvin
         for am_task in am_tasks:
             print(f"Processing task: {am_task}")
-            # Find the corresponding task in Notion
-            notion_task = notion_service.get_task_for_compare_and_sync(am_task.am_id)
+            notion_task = notion_tasks.get(am_task.am_id, "No page returned!")
 
             if notion_task != "No page returned!":
                 # Task exists in Notion, check if it needs to be updated
@@ -307,7 +299,7 @@ def morning_sync() -> None:
 
         print("\nInitializing services...")
         garmin_service = GarminService()
-        notion_service = NotionManager()
+        notion_service = AsyncNotionManager()
         exist_service = ExistService()
         am_service = AmazingMarvinService()
         gcal_service = GoogleCalendarService()
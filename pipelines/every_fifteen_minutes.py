@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-Script to pull tasks updated in Amazing Marvin over the last 12 hours and update Notion.
+Script to pull tasks changed in Amazing Marvin since the last successful run and update Notion.
 This script is designed to be run periodically by a cron job.
 """
 
@@ -101,15 +101,17 @@ def sync_am_to_notion() -> None:
         am_service = AmazingMarvinService()
         notion_service = NotionManager()
 
-        # Get tasks updated in Amazing Marvin in the last 60 minutes
-        am_tasks = am_service.get_tasks_by_last_updated(60)
-        print(f"Found {len(am_tasks)} tasks updated in Amazing Marvin in the last 45 minutes")
+        # Get tasks changed in Amazing Marvin since the last successful sync
+        am_tasks = am_service.get_tasks_changed_since_last_sync()
+        print(f"Found {len(am_tasks)} tasks changed in Amazing Marvin since the last sync")
+
+        # Find the corresponding tasks in Notion in bulk
+        notion_tasks = notion_service.get_tasks_for_compare_and_sync([am_task.am_id for am_task in am_tasks])
 
         # For each task in Amazing Marvin
         for am_task in am_tasks:
             print(f"Processing task: {am_task}")
-            # Find the corresponding task in Notion
-            notion_task = notion_service.get_task_for_compare_and_sync(am_task.am_id)
+            notion_task = notion_tasks.get(am_task.am_id, "No page returned!")
 
             if notion_task != "No page returned!":
                 # Task exists in Notion, check if it needs to be updated
@@ -131,6 +133,8 @@ def sync_am_to_notion() -> None:
                 print(f"Processing task dependencies: {am_task.title} depends on {am_task.depends_on}")
                 notion_service.update_task_dependencies(am_task)
 
+        # Only now move the changes feed past these tasks, so a failed run retries them
+        am_service.commit_tasks_changes_seq()
         print("Amazing Marvin to Notion synchronization completed successfully")
     except Exception as e:
         print(f"Error synchronizing Amazing Marvin to Notion: {e}")
@@ -58,15 +58,16 @@ def sync_garmin_to_notion() -> None:
             activities = garmin_service.get_workouts()
             today_activities = [a for a in activities if a.activity_date.date_in_datetime.date() == today.date_in_datetime.date()]
 
-            # Update Notion
-            # Update steps and distance
-            notion_service.update_steps_entries_for_today(steps, total_distance)
+            # Update Notion, with every change to the same page sent as one update
+            with notion_service.coalesced_writes():
+                # Update steps and distance
+                notion_service.update_steps_entries_for_today(steps, total_distance)
 
-            # Update calories out
-            notion_service.update_calories_out_in_daily_tracking(today, calories_out)
+                # Update calories out
+                notion_service.update_calories_out_in_daily_tracking(today, calories_out)
 
-            # Update training status and readiness
-            notion_service.update_training_entries_for_today(training_status, readiness_score, readiness_description, stress)
+                # Update training status and readiness
+                notion_service.update_training_entries_for_today(training_status, readiness_score, readiness_description, stress)
 
             # Update activities
             for activity in today_activities:
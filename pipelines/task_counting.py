@@ -12,11 +12,18 @@ def count_notion_tasks_and_send_to_exist():
             today = Timecube.from_datetime(datetime.now())
             yesterday = Timecube.from_datetime(datetime.now() - timedelta(days=1))
 
-            yesterday_tasks = notion_service.get_tasks_completed_by_date(yesterday)
-            today_tasks, upcoming_week_tasks = notion_service.get_tasks_for_date_and_next_6_days(today)
-            yesterday_count = len(yesterday_tasks)
-            today_count = len(today_tasks)
-            upcoming_week_count = len(upcoming_week_tasks)
+            # One query covers yesterday through the next 6 days, bucketed by day; every count comes from it
+            tasks_by_day = notion_service.get_task_pages_in_date_range(
+                yesterday, today.add_timedelta(timedelta(days=6)))
+
+            yesterday_count = today_count = upcoming_week_count = 0
+            for day, task_pages in tasks_by_day.items():
+                if day == yesterday.date_Y_m_d:
+                    yesterday_count = len([page for page in task_pages if page["properties"]["Done"]["checkbox"]])
+                    continue
+                if day == today.date_Y_m_d:
+                    today_count = len(task_pages)
+                upcoming_week_count += len(task_pages)
 
             exist_service.post_tasks_completed(yesterday, yesterday_count)
             exist_service.post_tasks_planned(today, today_count)
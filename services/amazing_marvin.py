@@ -5,12 +5,17 @@ from data_models.project import Project
 from data_models.subtask import Subtask
 from data_models.task import Task
 from data_models.timecube import Timecube
+from services.category_tree import CategoryTree
+from services.http_transport import build_session
+from services.rate_limiter import AdaptiveRateLimiter
+from services.sync_state import SyncStateStore
 
 from couchdb import Server
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from typing import List, Any
+from typing import Any, Iterator, List
 import calendar
+import json
 import os
 import re
 import requests
@@ -21,6 +26,28 @@ import urllib.parse
 class AmazingMarvinService:
     load_dotenv()
 
+    # Shared by every instance in the process. The REST API asks for about one request per second; the
+    # CouchDB sync server answers 429 past a few queries per second. Both back off further on a 429.
+    _rest_limiter = AdaptiveRateLimiter("Amazing Marvin API", rate=1, burst=3)
+    _couch_limiter = AdaptiveRateLimiter("Amazing Marvin sync database", rate=5, burst=5)
+    # Mango indexes behind the selectors this service sends, created once per process
+    MANGO_DESIGN_DOC = "notion-sync"
+    MANGO_INDEXES = [
+        {"name": "db-day", "fields": ["db", "day"]},
+        {"name": "db-updatedAt", "fields": ["db", "updatedAt"]},
+        {"name": "db-parentId", "fields": ["db", "parentId"]},
+        {"name": "db-title", "fields": ["db", "title"]},
+    ]
+    FIND_PAGE_SIZE = 200
+    # Mango `fields` projections: only what the DTO converters read, plus g_in_<goalId> for every known goal.
+    # Documents that are written back (trackers) are read whole with _find_all instead.
+    TASK_FIELDS = ["_id", "_rev", "db", "title", "day", "timeEstimate", "duration", "plannedWeek", "plannedMonth",
+                   "updatedAt", "done", "parentId", "dependsOn", "subtasks", "labelIds", "recurring"]
+    PROJECT_FIELDS = ["_id", "_rev", "db", "title", "type", "parentId", "day", "plannedWeek", "plannedMonth",
+                      "updatedAt", "done", "labelIds"]
+    _indexes_ensured = False
+    _explained_selectors = set()
+
     def __init__(self):
         self.json_header = 'application/json'
         self.full_access_token = self._ensure_proper_encoding(os.getenv("AM_FULL_ACCESS_TOKEN"))
@@ -31,12 +58,23 @@ class AmazingMarvinService:
 
         self.api_url = 'https://serv.amazingmarvin.com/api/'
         self.api_headers = {'X-Full-Access-Token': self.full_access_token}
+        # Keep-alive connections with timeouts and bounded retries for the REST API
+        self.session = build_session(headers=self.api_headers)
         self.database_url = f"https://{self.sync_user}:{self.sync_password}@{self.sync_server}"
 
         # Add cache dictionaries
         self._project_cache = {}  # Cache for projects by ID
         self._goal_cache = {}     # Cache for goals by ID
+        self._task_title_cache = {}  # Cache for dependency task titles by ID
+        self._missing_doc_ids = set()  # Dependency/goal IDs a batch lookup found no document for
+        self._goal_ids = None  # Every goal ID, loaded on first use to build field projections
         self._label_cache = None  # Cache for all labels (will be populated on first use)
+        self._category_tree = None  # Every category/project, loaded on first use
+        self._category_tree_reloaded = False
+
+        # Changes-feed position, stored only once the changes read from it have been synced
+        self._sync_state = SyncStateStore()
+        self._pending_changes_seq = None
 
         try:
             parsed_url = urllib.parse.urlparse(self.database_url)
@@ -113,13 +151,88 @@ class AmazingMarvinService:
     """
     Generic GET/POST functions
     """
+    def ensure_indexes(self):
+        """
+        Create the Mango indexes the service's selectors rely on. CouchDB leaves existing indexes alone,
+        so this is safe to repeat; it runs once per process before the first query. Set
+        AM_MANAGE_INDEXES=false to skip it, e.g. when the sync user may not write design documents.
+        """
+        if AmazingMarvinService._indexes_ensured:
+            return
+        AmazingMarvinService._indexes_ensured = True
+        if os.getenv("AM_MANAGE_INDEXES", "true").lower() in ("0", "false", "no"):
+            return
+        for index in self.MANGO_INDEXES:
+            try:
+                _, _, result = self._couch_limiter.call(
+                    self.db.resource.post_json, '_index',
+                    body={'index': {'fields': index['fields']}, 'ddoc': self.MANGO_DESIGN_DOC,
+                          'name': index['name'], 'type': 'json'})
+                if result.get('result') == 'created':
+                    print(f"Created Mango index {index['name']} on {index['fields']}")
+            except Exception as e:
+                print(f"Could not create Mango index {index['name']}: {e}")
+
+    def _explain(self, query: dict):
+        """
+        With AM_EXPLAIN_QUERIES set, ask CouchDB once per selector shape which index it would use and
+        warn about queries that fall back to scanning every document
+        """
+        if not os.getenv("AM_EXPLAIN_QUERIES"):
+            return
+        shape = json.dumps(sorted(query['selector'].keys()))
+        if shape in self._explained_selectors:
+            return
+        self._explained_selectors.add(shape)
+        try:
+            _, _, plan = self._couch_limiter.call(self.db.resource.post_json, '_explain', body=query)
+        except Exception as e:
+            print(f"Could not explain query {query['selector']}: {e}")
+            return
+        index = plan.get('index', {})
+        if index.get('type') == 'special' and index.get('name') == '_all_docs':
+            print(f"Warning: no index covers selector {query['selector']}, CouchDB scans every document")
+        else:
+            print(f"Selector {query['selector']} uses index {index.get('ddoc')}/{index.get('name')}")
+
+    def _find_all(self, query: dict, page_size: int = None) -> Iterator[dict]:
+        """
+        Stream every document matching a Mango query, following the bookmark page by page instead of
+        stopping at CouchDB's default limit of 25. A `limit` in the query caps the total returned.
+        """
+        self.ensure_indexes()
+        page_size = page_size or self.FIND_PAGE_SIZE
+        remaining = query.get('limit')
+        body = dict(query)
+        self._explain({key: value for key, value in body.items() if key != 'limit'})
+        while True:
+            body['limit'] = min(page_size, remaining) if remaining is not None else page_size
+            _, _, page = self._couch_limiter.call(self.db.resource.post_json, '_find', body=body)
+            docs = page.get('docs', [])
+            yield from docs
+            if remaining is not None:
+                remaining -= len(docs)
+                if remaining <= 0:
+                    return
+            if len(docs) < body['limit'] or not page.get('bookmark'):
+                return
+            body['bookmark'] = page['bookmark']
+
+    def _goal_fields(self) -> List[str]:
+        """Fields marking goal membership (g_in_<goalId>), for every goal; also fills the goal cache"""
+        if self._goal_ids is None:
+            goals = list(self._find_all({'selector': {'db': 'Goals'}, 'fields': ['_id', 'title']}))
+            for goal in goals:
+                self._goal_cache[goal['_id']] = goal.get('title')
+            self._goal_ids = [goal['_id'] for goal in goals]
+        return [f"g_in_{goal_id}" for goal_id in self._goal_ids]
+
     def _get_projects(self, payload: dict) -> List[dict] | str:
         projects_payload = {'db': 'Categories'}
         projects_payload.update(payload)
-        projects_selector = {'selector': projects_payload}
-        print(f"Sending project request with payload:", projects_selector)
-        projects_map = self.db.find(projects_selector)
-        time.sleep(3)
+        projects_selector = {'selector': projects_payload, 'fields': self.PROJECT_FIELDS + self._goal_fields()}
+        print(f"Sending project request with payload:", projects_selector["selector"])
+        projects_map = self._find_all(projects_selector)
         projects_dto = []
 
         # Collect all documents from the map into a list
@@ -137,16 +250,47 @@ class AmazingMarvinService:
     def _get_tasks(self, payload: dict) -> str | list[Any]:
         tasks_payload = {'db': 'Tasks'}
         tasks_payload.update(payload)
-        tasks_selector = {'selector': tasks_payload}
-        print(f"Sending task request with payload:", tasks_selector)
-        tasks_map = self.db.find(tasks_selector)
-        time.sleep(3)
-        tasks_list = list(tasks_map)
+        tasks_selector = {'selector': tasks_payload, 'fields': self.TASK_FIELDS + self._goal_fields()}
+        print(f"Sending task request with payload:", tasks_selector["selector"])
+        tasks_list = list(self._find_all(tasks_selector))
         if len(tasks_list) == 0:
             return "No tasks returned!"
         else:
             return tasks_list
 
+    def _get_changed_docs(self, since: str | int, selector: dict, batch_size: int = 200) -> tuple[List[dict], str]:
+        """
+        Read the CouchDB _changes feed from `since`, keeping only documents that match the Mango selector.
+
+        Follows the feed in batches until nothing is pending. Deleted documents are left out.
+
+        Returns the changed documents and the sequence to resume from next time.
+        """
+        docs = []
+        while True:
+            print(f"Sending changes request since {str(since)[:20]} with selector:", selector)
+            _, _, changes = self._couch_limiter.call(
+                self.db.resource.post_json, '_changes', body={'selector': selector},
+                filter='_selector', include_docs='true', since=since, limit=batch_size)
+            for change in changes.get('results', []):
+                doc = change.get('doc')
+                if doc and not change.get('deleted') and not doc.get('_deleted'):
+                    docs.append(doc)
+            since = changes.get('last_seq', since)
+            if not changes.get('pending') or not changes.get('results'):
+                return docs, since
+
+    def _get_docs_by_ids(self, doc_ids: List[str], chunk_size: int = 200) -> List[dict]:
+        """Fetch documents of any type by ID, one `_id $in` query per chunk"""
+        docs = []
+        doc_ids = list(dict.fromkeys(doc_ids))
+        for start in range(0, len(doc_ids), chunk_size):
+            chunk = doc_ids[start:start + chunk_size]
+            ids_selector = {'selector': {'_id': {'$in': chunk}}, 'fields': ['_id', 'db', 'title']}
+            print(f"Sending batch request for {len(chunk)} documents")
+            docs.extend(self._find_all(ids_selector))
+        return docs
+
     def _post_habit(self, habit_id: str, completion_time: Timecube, value: int) -> dict:
         url = f"{self.api_url}updateHabit"
         data = {
@@ -156,13 +300,13 @@ class AmazingMarvinService:
             "updateDB": True
         }
         print(f"Sending habit request with payload:", data)
-        response = self._handle_request_with_encoding(
-            requests.post,
+        response = self._rest_limiter.call(
+            self._handle_request_with_encoding,
+            self.session.post,
             url,
             headers=self.api_headers,
             json=data
         )
-        time.sleep(3)
         return response.json()
 
     def _delete_any_doc(self, doc_id: str) -> dict:
@@ -172,8 +316,7 @@ class AmazingMarvinService:
             "itemId": doc_id
         }
         print(f"Sending deletion request with payload:", data)
-        response = requests.post(url, headers=self.api_headers, json=data)
-        time.sleep(3)
+        response = self._rest_limiter.call(self.session.post, url, headers=self.api_headers, json=data)
         print(response.json())
         return response.json()
 
@@ -204,6 +347,25 @@ class AmazingMarvinService:
             raise Exception(projects)
         return projects[0] if projects else {}
 
+    def _get_category_tree(self, reload: bool = False) -> CategoryTree:
+        """Load every category and project once per run and index them by ID"""
+        if self._category_tree is None or reload:
+            categories = self._get_projects({})
+            if isinstance(categories, str):
+                categories = []
+            self._category_tree = CategoryTree(categories)
+            self._category_tree_reloaded = reload
+            for category in categories:
+                self._project_cache[category["_id"]] = category
+        return self._category_tree
+
+    def _get_category_ancestry(self, category_id: str) -> tuple | None:
+        tree = self._get_category_tree()
+        if category_id not in tree and not self._category_tree_reloaded:
+            # Possibly created since the tree was loaded
+            tree = self._get_category_tree(reload=True)
+        return tree.ancestry(category_id)
+
     def _get_task_by_id(self, task_id: str) -> dict | str:
         payload = {'_id': task_id}
         task = self._get_tasks(payload)
@@ -219,26 +381,41 @@ class AmazingMarvinService:
         #if the parent is "unassigned" set Project to Inbox
         if am_response.get("parentId") == "unassigned":
             dto.project = "Inbox"
+            return dto
+
+        #else look up the parent's (pillar, value goal, project) in the category tree
+        ancestry = self._get_category_ancestry(am_response.get("parentId"))
+        if ancestry is None:
+            return self._climb_category_hierarchy(am_response, dto)
+        pillar, subcategory, project = ancestry
+        dto.pillar = pillar
+        if subcategory is not None:
+            dto.subcategory = subcategory
+        if project is not None:
+            dto.project = project
+        return dto
 
-        #else parent = _get_project_by_id(parentId) and check type
-        else:
-            parent_response = self._get_project_by_id(am_response.get("parentId"))
+    def _climb_category_hierarchy(self, am_response: dict, dto: Task | Project) -> Task | Project:
+        """Query-per-level fallback for parents the category tree can't place"""
+        #parent = _get_project_by_id(parentId) and check type
+        parent_response = self._get_project_by_id(am_response.get("parentId"))
 
-            ##if parent.parentId = root set Pillar based on parent.title
-            if parent_response.get("parentId") == "root":
-                dto.pillar = parent_response.get("title")
+        ##if parent.parentId = root set Pillar based on parent.title
+        if parent_response.get("parentId") == "root":
+            dto.pillar = parent_response.get("title")
 
-            ##else check parent.type
-            else:
-                while parent_response.get("parentId") != "root":
-                    ###if parent.type == category set Value Goal based on parent.title, then climb taxonomy
-                    if parent_response.get("type") == "category":
-                        dto.subcategory = parent_response.get("title")
-                    ###if parent.type == project set Project based on parent.title, then climb taxonomy
-                    if parent_response.get("type") == "project":
-                        dto.project = parent_response.get("title")
-                    parent_response = self._get_project_by_id(parent_response.get("parentId"))
-                dto.pillar = parent_response.get("title")
+        ##else check parent.type
+        else:
+            # An empty response means a missing parent; stop there instead of climbing forever
+            while parent_response and parent_response.get("parentId") != "root":
+                ###if parent.type == category set Value Goal based on parent.title, then climb taxonomy
+                if parent_response.get("type") == "category":
+                    dto.subcategory = parent_response.get("title")
+                ###if parent.type == project set Project based on parent.title, then climb taxonomy
+                if parent_response.get("type") == "project":
+                    dto.project = parent_response.get("title")
+                parent_response = self._get_project_by_id(parent_response.get("parentId"))
+            dto.pillar = parent_response.get("title")
 
         return dto
 
@@ -247,8 +424,7 @@ class AmazingMarvinService:
         if self._label_cache is None:
             url = f"{self.api_url}labels"
             print(f"Sending label request with url:", url)
-            response = requests.get(url, headers=self.api_headers).json()
-            time.sleep(3)
+            response = self._rest_limiter.call(self.session.get, url, headers=self.api_headers).json()
 
             self._label_cache = {}
             for item in response:
@@ -267,22 +443,56 @@ class AmazingMarvinService:
 
         return resolved_labels
 
+    @staticmethod
+    def _goal_ids_in(am_response: dict) -> List[str]:
+        return [match.group(1) for match in (re.match(r"g_in_(.+)", key) for key in am_response) if match]
+
+    def _prefetch_dependencies_and_goals(self, task_responses: List[dict]):
+        """
+        Look up the dependency tasks and goals of a whole batch of tasks with one query, so converting
+        each task reads their titles from the caches instead of querying per ID
+        """
+        wanted_ids = []
+        for task_response in task_responses:
+            wanted_ids.extend(task_id for task_id in (task_response.get("dependsOn") or {})
+                              if task_id not in self._task_title_cache)
+            wanted_ids.extend(goal_id for goal_id in self._goal_ids_in(task_response)
+                              if goal_id not in self._goal_cache)
+        wanted_ids = [doc_id for doc_id in dict.fromkeys(wanted_ids) if doc_id not in self._missing_doc_ids]
+        if not wanted_ids:
+            return
+
+        found_ids = set()
+        for doc in self._get_docs_by_ids(wanted_ids):
+            if doc.get("db") == "Tasks":
+                self._task_title_cache[doc["_id"]] = doc.get("title")
+            elif doc.get("db") == "Goals":
+                self._goal_cache[doc["_id"]] = doc.get("title")
+            else:
+                continue
+            found_ids.add(doc["_id"])
+        self._missing_doc_ids.update(doc_id for doc_id in wanted_ids if doc_id not in found_ids)
+
     def _replace_depends_on_id_with_title(self, am_response: dict) -> List[str]:
         dependencies = list(am_response["dependsOn"].keys())
         resolved_dependencies = []
         for item in dependencies:
+            # Check the batch caches first
+            if item in self._task_title_cache:
+                resolved_dependencies.append(self._task_title_cache[item])
+                continue
+            if item in self._missing_doc_ids:
+                continue
+
             dependency_response = self._get_task_by_id(item)
             if dependency_response != "No tasks returned!":
+                self._task_title_cache[item] = dependency_response["title"]
                 resolved_dependencies.append(dependency_response["title"])
         return resolved_dependencies
 
     def _replace_goal_id_with_goal_title(self, am_response: dict) -> List[str] | Exception:
-        goal_ids = []
+        goal_ids = self._goal_ids_in(am_response)
         goal_titles = []
-        for key, value in am_response.items():
-            match = re.match(r"g_in_(.+)", key)
-            if match:
-                goal_ids.append(match.group(1))
 
         if goal_ids:
             for goal_id in goal_ids:
@@ -290,13 +500,14 @@ class AmazingMarvinService:
                 if goal_id in self._goal_cache:
                     goal_titles.append(self._goal_cache[goal_id])
                     continue
+                if goal_id in self._missing_doc_ids:
+                    continue
 
                 # If not in cache, make the API call
                 goal_payload = {'db': 'Goals', '_id': goal_id}
-                goal_selector = {'selector': goal_payload}
+                goal_selector = {'selector': goal_payload, 'fields': ['_id', 'title']}
                 print(f"Sending goal request with payload:", goal_selector)
-                goal_map = self.db.find(goal_selector)
-                time.sleep(3)
+                goal_map = self._find_all(goal_selector)
                 if goal_map is None:
                     return Exception("Goal id invalid!")
 
@@ -345,6 +556,12 @@ class AmazingMarvinService:
 
         return task_dto
 
+    def _convert_task_responses_to_dtos(self, task_responses: List[dict] | str) -> List[Task]:
+        if task_responses == "No tasks returned!":
+            return []
+        self._prefetch_dependencies_and_goals(task_responses)
+        return [self._convert_task_response_to_dto(task_response) for task_response in task_responses]
+
     def _convert_project_response_to_dto(self, project_response: dict):
         project_dto = Project.from_am_json(project_response)
 
@@ -387,30 +604,41 @@ class AmazingMarvinService:
         day =  (datetime.now() + timedelta(days=14)).strftime('%Y-%m-%d')
         payload = {'parentId': project_id, '$or': [{'day': {'$lte': day}}, {'day': 'unassigned'}]}
         tasks_list = self._get_tasks(payload)
-        tasks = []
-        for row in tasks_list:
-            task_dto = self._convert_task_response_to_dto(row)
-            tasks.append(task_dto)
-        return tasks
+        return self._convert_task_responses_to_dtos(tasks_list)
 
     def get_tasks_by_scheduled(self, scheduled_date: Timecube) -> List[Task]:
         payload = {'day': scheduled_date.date_Y_m_d}
         tasks_map = self._get_tasks(payload)
-        tasks = []
-        for row in tasks_map:
-            task_dto = self._convert_task_response_to_dto(row)
-            tasks.append(task_dto)
-        return tasks
+        return self._convert_task_responses_to_dtos(tasks_map)
 
     def get_tasks_by_last_updated(self, minutes_in_the_past: int):
         query_epoch = int((datetime.now() - timedelta(minutes=minutes_in_the_past)).timestamp() * 1000)
         payload = {'updatedAt': {'$gte': query_epoch}}
         tasks_map = self._get_tasks(payload)
-        tasks = []
-        for row in tasks_map:
-            task_dto = self._convert_task_response_to_dto(row)
-            tasks.append(task_dto)
-        return tasks
+        return self._convert_task_responses_to_dtos(tasks_map)
+
+    def get_tasks_changed_since_last_sync(self, initial_minutes: int = 60) -> List[Task]:
+        """
+        Get the tasks changed since the last sync that called commit_tasks_changes_seq, read from the
+        sync database's _changes feed, so each run only touches what actually changed.
+
+        The first run has no stored sequence: it starts the feed at the database's current sequence and
+        falls back to the tasks updated in the last `initial_minutes`.
+        """
+        changes_key = f"am:changes_seq:{self.sync_database}"
+        since = self._sync_state.get(changes_key)
+        if since is None:
+            self._pending_changes_seq = self._couch_limiter.call(self.db.info)['update_seq']
+            return self.get_tasks_by_last_updated(initial_minutes)
+
+        task_docs, self._pending_changes_seq = self._get_changed_docs(since, {'db': 'Tasks'})
+        return self._convert_task_responses_to_dtos(task_docs)
+
+    def commit_tasks_changes_seq(self):
+        """Mark the tasks returned by get_tasks_changed_since_last_sync as synced"""
+        if self._pending_changes_seq is not None:
+            self._sync_state.set(f"am:changes_seq:{self.sync_database}", self._pending_changes_seq)
+            self._pending_changes_seq = None
 
     def get_next_seven_days_tasks(self, initial_date: Timecube) -> List[Task]:
         tasks = []
@@ -425,8 +653,7 @@ class AmazingMarvinService:
     def post_habit_by_title(self, title: str, completion_time: Timecube, value: int) -> dict | str:
         url = f"{self.api_url}habits?raw=1"
         print(f"Sending habit request with url:", url)
-        habits_list = requests.get(url, headers=self.api_headers).json()
-        time.sleep(3)
+        habits_list = self._rest_limiter.call(self.session.get, url, headers=self.api_headers).json()
         habit_id = ""
         for habit in habits_list:
             if habit.get('title') == title:
@@ -438,16 +665,14 @@ class AmazingMarvinService:
     def post_daily_note(self, date: Timecube, note: str) -> tuple:
         note_payload = {'db': 'DayItems', '_id': 'di_' + date.date_Y_m_d, 'note': note}
         print(f"Sending note request with payload:", note_payload)
-        response = self.db.save(note_payload)
-        time.sleep(3)
+        response = self._couch_limiter.call(self.db.save, note_payload)
         return response
 
     def post_value_to_tracker_by_title(self, tracker_title: str, time_of_habit: Timecube, value: int) -> List | str:
         tracker_selector = {'selector': {'db': 'Trackers', 'title': tracker_title}}
         print(f"Sending tracker request with payload:", tracker_selector)
         try:
-            tracker = self.db.find(tracker_selector).__next__()
-            time.sleep(3)
+            tracker = self._find_all(dict(tracker_selector, limit=1)).__next__()
         except StopIteration:
             raise StopIteration("Tracker does not exist!")
 
@@ -458,7 +683,6 @@ class AmazingMarvinService:
         tracker['updatedAt'] = int(time.time() * 1000)
 
         print(f"Sending tracker update with payload:", tracker)
-        response = self.db.update([tracker])
-        time.sleep(3)
+        response = self._couch_limiter.call(self.db.update, [tracker])
         return response
 
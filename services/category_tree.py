@@ -0,0 +1,57 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class CategoryTree:
+    """
+    Every Amazing Marvin category and project (the `db: Categories` documents) as a parent-pointer tree.
+
+    ancestry() answers what AmazingMarvinService used to find by climbing the hierarchy one query at a
+    time: the pillar (the ancestor directly under root), the value goal (the highest category below the
+    pillar) and the project (the highest project below the pillar). Results are memoized per category,
+    so resolving the taxonomy of any task or project is a dictionary lookup.
+    """
+
+    def __init__(self, categories: Iterable[dict]):
+        self._categories: Dict[str, dict] = {category["_id"]: category for category in categories}
+        self._ancestry: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]] = {}
+
+    def __contains__(self, category_id: str) -> bool:
+        return category_id in self._categories
+
+    def __len__(self) -> int:
+        return len(self._categories)
+
+    def get(self, category_id: str) -> Optional[dict]:
+        return self._categories.get(category_id)
+
+    def ancestry(self, category_id: str) -> Optional[Tuple[Optional[str], Optional[str], Optional[str]]]:
+        """
+        (pillar, value goal, project) for an item whose parent is `category_id`. The value goal and
+        project are None when no ancestor of that type sits below the pillar. Returns None when the chain
+        up to root is broken (a missing or cyclic parent).
+        """
+        chain = []
+        current = category_id
+        while current not in self._ancestry:
+            category = self._categories.get(current)
+            if category is None or current in chain:
+                return None
+            chain.append(current)
+            if category.get("parentId") == "root":
+                break
+            current = category.get("parentId")
+
+        if chain and self._categories[chain[-1]].get("parentId") == "root":
+            pillar_id = chain.pop()
+            self._ancestry[pillar_id] = (self._categories[pillar_id].get("title"), None, None)
+
+        # Walk back down so each category inherits from its parent; higher ancestors win
+        for current in reversed(chain):
+            category = self._categories[current]
+            pillar, value_goal, project = self._ancestry[category.get("parentId")]
+            if value_goal is None and category.get("type") == "category":
+                value_goal = category.get("title")
+            if project is None and category.get("type") == "project":
+                project = category.get("title")
+            self._ancestry[current] = (pillar, value_goal, project)
+        return self._ancestry[category_id]
@@ -1,32 +1,104 @@
+from data_models.event import EventSummary
 from data_models.insight import Insight
 from data_models.timecube import Timecube
+from services.http_transport import build_session
+from services.rate_limiter import AdaptiveRateLimiter
 
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from typing import List
+from typing import Any, Dict, List, Tuple
 import os
-import requests
 
 
 class ExistService:
     load_dotenv()
+    # Shared by every instance in the process; backs off further if Exist answers 429
+    _limiter = AdaptiveRateLimiter("Exist API", rate=2, burst=5)
+    MAX_UPDATES_PER_REQUEST = 35  # Exist's limit for one attributes/update/ call
+    MAX_DAYS_PER_REQUEST = 31  # Exist's limit on `days` for attributes/with-values/
+    PAGE_SIZE = 100
 
     def __init__(self):
         self.url = 'https://exist.io/api/2/'
         self.headers = {'Authorization': 'Bearer ' + os.getenv("EXIST_TOKEN"), 'Content-Type': 'application/json'}
-
-    def _get_attribute(self, attribute: str, day: Timecube):
-        url = f"{self.url}attributes/values/"
-        attribute_payload = {"attribute": [attribute], "date_max": day.date_Y_m_d}
-        response = requests.get(url, headers=self.headers, params=attribute_payload)
-        return response.json().get('results')
+        # Keep-alive connections with timeouts and bounded retries
+        self.session = build_session(headers=self.headers)
+        self._update_buffer: Dict[Tuple[str, str], dict] | None = None
+        self._update_buffer_depth = 0
+        self.failed_updates: List[dict] = []
 
     def _post_attribute(self, attribute: str, attribute_date: Timecube, value: int):
         url = f"{self.url}attributes/update/"
         attribute_payload = {"name": attribute, "date": attribute_date.date_Y_m_d, "value": value}
-        response = requests.post(url, headers=self.headers, json=attribute_payload)
+        if self._update_buffer is not None:
+            # Later values for the same attribute and day replace earlier ones
+            self._update_buffer[(attribute, attribute_payload["date"])] = attribute_payload
+            return {"queued": attribute_payload}
+        response = self._limiter.call(self.session.post, url, json=attribute_payload)
         return response.json()
 
+    @contextmanager
+    def batched_updates(self):
+        """
+        Queue every attribute update made inside the block and send them when the outermost block exits,
+        MAX_UPDATES_PER_REQUEST per call instead of one call each:
+
+            with exist_service.batched_updates():
+                exist_service.post_readiness(yesterday, readiness_score)
+                exist_service.post_stress(yesterday, stress)
+
+        Updates Exist rejects are printed and kept in failed_updates with the attribute they belong to.
+        """
+        self._update_buffer_depth += 1
+        if self._update_buffer is None:
+            self._update_buffer = {}
+        try:
+            yield
+        finally:
+            self._update_buffer_depth -= 1
+            if self._update_buffer_depth == 0:
+                updates = list(self._update_buffer.values())
+                self._update_buffer = None
+                self._post_attributes(updates)
+
+    def _post_attributes(self, updates: List[dict]) -> dict:
+        url = f"{self.url}attributes/update/"
+        results = {"success": [], "failed": []}
+        for start in range(0, len(updates), self.MAX_UPDATES_PER_REQUEST):
+            chunk = updates[start:start + self.MAX_UPDATES_PER_REQUEST]
+            try:
+                response = self._limiter.call(self.session.post, url, json=chunk)
+                body = response.json()
+            except Exception as e:
+                body, response = {}, None
+                error = str(e)
+            else:
+                error = None if response.ok else f"HTTP {response.status_code}: {body}"
+
+            if error is not None and not body.get("failed"):
+                # The whole request was refused, so every update in it failed
+                failed = [dict(update, error=error) for update in chunk]
+                success = []
+            else:
+                failed = [self._match_failed_update(chunk, item) for item in body.get("failed", [])]
+                success = body.get("success", [])
+            results["success"].extend(success)
+            results["failed"].extend(failed)
+
+        for failure in results["failed"]:
+            print(f"Exist rejected {failure.get('name')} for {failure.get('date')}: {failure.get('error')}")
+        self.failed_updates.extend(results["failed"])
+        return results
+
+    @staticmethod
+    def _match_failed_update(chunk: List[dict], failure: dict) -> dict:
+        """The queued update a failure entry refers to, with the error Exist gave for it"""
+        for update in chunk:
+            if update["name"] == failure.get("name") and update["date"] == failure.get("date", update["date"]):
+                return dict(update, error=failure.get("error"), error_code=failure.get("error_code"))
+        return failure
+
     ## Productivity Group
     def post_declutter_time(self, timecube: Timecube, value: int):
         return self._post_attribute("declutter", timecube, value)
@@ -50,6 +122,22 @@ class ExistService:
     def post_time_in_events(self, timecube: Timecube, value: int):
         return self._post_attribute("events_duration", timecube, value)
 
+    def post_event_summary(self, timecube: Timecube, summary: EventSummary):
+        """Post a day's event count and minutes, and set each tag attribute its events carry, once each"""
+        with self.batched_updates():
+            self.post_number_of_events(timecube, summary.count)
+            self.post_time_in_events(timecube, summary.duration)
+            if summary.tag_counts.get('activism'):
+                self.post_activism(timecube)
+            if summary.tag_counts.get('coven'):
+                self.post_coven(timecube)
+            if summary.tag_counts.get('family'):
+                self.post_family(timecube)
+            if summary.tag_counts.get('guest'):
+                self.post_guest(timecube)
+            if summary.tag_counts.get('social'):
+                self.post_social(timecube)
+
     ## Health and body Group
     def post_hrv(self, timecube: Timecube, value: int):
         return self._post_attribute("heartrate_variability", timecube, value)
@@ -94,7 +182,7 @@ class ExistService:
 
     def get_insights(self) -> List[Insight]:
         url = f"{self.url}insights/"
-        response = requests.get(url, headers=self.headers)
+        response = self._limiter.call(self.session.get, url)
         insights = response.json().get('results')
         insights_dto = []
         for item in insights:
@@ -102,37 +190,70 @@ class ExistService:
             insights_dto.append(insight_dto)
         return insights_dto
 
+    def get_attributes(self, names: List[str], date_min: Timecube, date_max: Timecube) -> Dict[str, Dict[str, Any]]:
+        """
+        Values of several attributes for every day from date_min to date_max, keyed by day and then by
+        attribute: {"2024-05-01": {"mood": 4, "mood_note": "..."}, ...}. Days without a value for an
+        attribute hold None.
+
+        One paginated attributes/with-values/ request covers all the attributes for up to
+        MAX_DAYS_PER_REQUEST days, so longer windows (catching up after missed runs) take one per month.
+        """
+        first_day = datetime.strptime(date_min.date_Y_m_d, "%Y-%m-%d")
+        last_day = datetime.strptime(date_max.date_Y_m_d, "%Y-%m-%d")
+        table = {}
+        for offset in range((last_day - first_day).days + 1):
+            table[(first_day + timedelta(days=offset)).strftime("%Y-%m-%d")] = {name: None for name in names}
+
+        window_end = last_day
+        while window_end >= first_day:
+            days = min(self.MAX_DAYS_PER_REQUEST, (window_end - first_day).days + 1)
+            url = f"{self.url}attributes/with-values/"
+            params = {"attributes": ",".join(names), "date_max": window_end.strftime("%Y-%m-%d"), "days": days,
+                      "limit": self.PAGE_SIZE}
+            while url:
+                response = self._limiter.call(self.session.get, url, params=params).json()
+                for attribute in response.get('results', []):
+                    for item in attribute.get('values', []):
+                        if item.get('date') in table:
+                            table[item['date']][attribute['name']] = item.get('value')
+                # The next page's URL already carries the query
+                url, params = response.get('next'), None
+            window_end -= timedelta(days=days)
+        return table
+
+    def _get_attribute(self, attribute: str, day: Timecube):
+        return self.get_attributes([attribute], day, day)[day.date_Y_m_d][attribute]
+
     def get_daily_note(self, timecube: Timecube) -> str:
-        response = self._get_attribute("mood_note", timecube)
-        return response[0].get('value')
+        return self._get_attribute("mood_note", timecube)
 
     def get_mood(self, timecube: Timecube) -> int:
-        response = self._get_attribute("mood", timecube)
-        return response[0].get('value')
+        return self._get_attribute("mood", timecube)
 
     def get_mobile_screen_time(self, timecube: Timecube) -> int:
-        response =  self._get_attribute("mobile_screen_min", timecube)
-        return response[0].get('value')
+        return self._get_attribute("mobile_screen_min", timecube)
 
     def post_yesterdays_habits(self, habits: dict):
         yesterday = Timecube.from_datetime(datetime.today() - timedelta(days=1))
-        for key in habits:
-            if key == "Vitamins & Supplements":
-                self._post_attribute("vitamins", yesterday, habits.get(key))
-            if key == "Prayers":
-                self._post_attribute("prayer", yesterday, habits.get(key))
-            if key == "Morning Hygiene":
-                self._post_attribute("morning_hygiene", yesterday, habits.get(key))
-            if key == "Evening Hygiene":
-                self._post_attribute("evening_hygiene", yesterday, habits.get(key))
-            if key == "Stick to Meal Plan":
-                self._post_attribute("stick_to_meal_plan", yesterday, habits.get(key))
-            if key == "Reading":
-                pages_read = 10 if habits.get(key) == 1 else 0
-                self._post_attribute("pages_read", yesterday, pages_read)
-            if key == "Wear Night Guard":
-                self._post_attribute("wear_night_guard", yesterday, habits.get(key))
-            if key == "Progress Photo":
-                self._post_attribute("progress_photo", yesterday, habits.get(key))
-            if key == "Clean Kitchen":
-                self._post_attribute("clean_kitchen", yesterday, habits.get(key))
+        with self.batched_updates():
+            for key in habits:
+                if key == "Vitamins & Supplements":
+                    self._post_attribute("vitamins", yesterday, habits.get(key))
+                if key == "Prayers":
+                    self._post_attribute("prayer", yesterday, habits.get(key))
+                if key == "Morning Hygiene":
+                    self._post_attribute("morning_hygiene", yesterday, habits.get(key))
+                if key == "Evening Hygiene":
+                    self._post_attribute("evening_hygiene", yesterday, habits.get(key))
+                if key == "Stick to Meal Plan":
+                    self._post_attribute("stick_to_meal_plan", yesterday, habits.get(key))
+                if key == "Reading":
+                    pages_read = 10 if habits.get(key) == 1 else 0
+                    self._post_attribute("pages_read", yesterday, pages_read)
+                if key == "Wear Night Guard":
+                    self._post_attribute("wear_night_guard", yesterday, habits.get(key))
+                if key == "Progress Photo":
+                    self._post_attribute("progress_photo", yesterday, habits.get(key))
+                if key == "Clean Kitchen":
+                    self._post_attribute("clean_kitchen", yesterday, habits.get(key))
@@ -1,7 +1,7 @@
 from data_models.event import Event
 from data_models.timecube import Timecube
 
-from datetime import timedelta
+from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -15,6 +15,7 @@ import pytz
 
 class GoogleCalendarService:
     SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+    MAX_BATCH_SIZE = 50  # Google's limit on calls in one batch request
     load_dotenv()
 
     def __init__(self):
@@ -26,30 +27,62 @@ class GoogleCalendarService:
         return calendars
 
     def get_events_for_date(self, calendar_id: str, date_timecube: Timecube) -> List[Event]:
+        return self.get_events_for_range([calendar_id], date_timecube, date_timecube)
+
+    def get_events_for_range(self, calendar_ids: List[str], start: Timecube, end: Timecube) -> List[Event]:
+        """
+        Events in any of the calendars from the start of `start`'s day to the end of `end`'s day, merged
+        and sorted by start (all-day events first).
+
+        The list calls for every calendar go out together as one batch request; calendars with more
+        pages are fetched in another batch with their pageToken until none are left.
+        """
+        time_min = self._local_midnight(start).astimezone(pytz.utc).isoformat()  # Convert to UTC for API
+        time_max = (self._local_midnight(end) + timedelta(days=1)).astimezone(pytz.utc).isoformat()
+
+        items = []
+        page_tokens = dict.fromkeys(calendar_ids)  # calendar -> pageToken of the next page to fetch
+        while page_tokens:
+            next_page_tokens = {}
+            errors = []
+
+            def collect(request_id, response, exception):
+                if exception is not None:
+                    errors.append(exception)
+                    return
+                items.extend(response.get('items', []))
+                if response.get('nextPageToken'):
+                    next_page_tokens[request_id] = response['nextPageToken']
+
+            pending = list(page_tokens.items())
+            for index in range(0, len(pending), self.MAX_BATCH_SIZE):
+                batch = self.service.new_batch_http_request(callback=collect)
+                for calendar_id, page_token in pending[index:index + self.MAX_BATCH_SIZE]:
+                    batch.add(self.service.events().list(
+                        calendarId=calendar_id,
+                        timeMin=time_min,
+                        timeMax=time_max,
+                        singleEvents=True,
+                        orderBy='startTime',
+                        pageToken=page_token
+                    ), request_id=calendar_id)
+                batch.execute()
+            if errors:
+                raise errors[0]
+            page_tokens = next_page_tokens
+
+        events_dtos = [Event.from_gcal_json(item) for item in items]
+        events_dtos.sort(key=lambda event: (event.start is not None, event.start.date_in_s if event.start else 0))
+        return events_dtos
+
+    @staticmethod
+    def _local_midnight(date_timecube: Timecube) -> datetime:
         # Confirm that the date_timecube has the expected timezone
         if date_timecube.local_tz != "America/New_York":
             raise ValueError(f"Expected timezone 'America/New_York', but got '{date_timecube.local_tz}'")
 
         # Localize to Eastern Time
-        midnight_date = date_timecube.date_in_datetime.replace(hour=0, minute=0, second=0, microsecond=0)
-        start_of_day = midnight_date.astimezone(pytz.utc).isoformat()  # Convert to UTC for API
-        end_of_day = (midnight_date + timedelta(days=1)).astimezone(pytz.utc).isoformat()
-
-        raw_events = self.service.events().list(
-                calendarId=calendar_id,
-                timeMin=start_of_day,
-                timeMax=end_of_day,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
-
-        events_dtos = []
-        if raw_events.get('items'):
-            event: Event
-            for item in raw_events.get('items'):
-                event = Event.from_gcal_json(item)
-                events_dtos.append(event)
-        return events_dtos
+        return date_timecube.date_in_datetime.replace(hour=0, minute=0, second=0, microsecond=0)
 
     @staticmethod
     def _authenticate():
@@ -0,0 +1,56 @@
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import os
+import requests
+
+
+DEFAULT_CONNECT_TIMEOUT = 5  # seconds
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_RETRIES = 3
+
+
+class TimeoutSession(requests.Session):
+    """requests.Session that applies a default (connect, read) timeout to every request"""
+
+    def __init__(self, timeout: tuple):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def build_session(headers: dict = None, connect_timeout: float = None, read_timeout: float = None,
+                  retries: int = DEFAULT_RETRIES, pool_size: int = 10) -> TimeoutSession:
+    """
+    Pooled keep-alive session for one service's HTTP API, so consecutive calls reuse a warm connection.
+
+    Every request gets a connect/read timeout (HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT seconds unless
+    given). Failed connections are retried for any method, since nothing was sent yet. Read errors and
+    5xx responses are retried only for idempotent methods, so a POST is never repeated. Retries back off
+    exponentially. 429s are never retried here, whatever their Retry-After says: they go back to the
+    caller so its rate limiter can see them and slow down.
+    """
+    connect_timeout = connect_timeout or float(os.getenv("HTTP_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT))
+    read_timeout = read_timeout or float(os.getenv("HTTP_READ_TIMEOUT", DEFAULT_READ_TIMEOUT))
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        # Otherwise urllib3 retries 429s that carry Retry-After itself, hiding them from the caller
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = TimeoutSession((connect_timeout, read_timeout))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
@@ -10,12 +10,23 @@ from services.notion.database_specific import NotionDatabaseSpecific
 from services.notion.transformer import NotionTransformer
 
 from datetime import datetime, timedelta
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 import os
 
 class NotionManager(NotionPageSpecific, NotionTransformer):
 
+    def coalesced_writes(self):
+        """
+        Context manager that merges every page update made inside it into one PATCH per page, sent when
+        the block exits:
+
+            with notion_service.coalesced_writes():
+                notion_service.update_daily_note(daily_note, yesterday)
+                notion_service.update_mobile_screen_time(mobile_screen_time, yesterday)
+        """
+        return self._coalesced_writes()
+
     def get_habits_from_daily_tracking_page_by_date(self, timecube: Timecube) -> dict | str:
         habit_object = {}
         daily_tracking_page = self._get_daily_tracking_pages_by_date(timecube)[0]
@@ -27,33 +38,77 @@ class NotionManager(NotionPageSpecific, NotionTransformer):
 
     def get_tasks_by_scheduled(self, scheduled_date: Timecube) -> List[Task]:
         task_pages = self._get_task_pages_by_scheduled_date(scheduled_date)
-        task_dtos = []
         if task_pages == "No page returned!":
             return []
-        for page in task_pages:
-            task = self._convert_task_response_to_dto(page)
-            task_dtos.append(task)
-        return task_dtos
+        return self._convert_task_responses_to_dtos(task_pages)
 
     def get_tasks_completed_by_date(self, timecube: Timecube) -> List[Task]:
         task_pages = self._get_task_pages_by_scheduled_date(timecube)
-        task_dtos = []
         if task_pages == "No page returned!":
             return []
-        for page in task_pages:
-            if page["properties"]["Done"]["checkbox"]:
-                task = self._convert_task_response_to_dto(page)
-                task_dtos.append(task)
-        return task_dtos
+        done_pages = [page for page in task_pages if page["properties"]["Done"]["checkbox"]]
+        return self._convert_task_responses_to_dtos(done_pages)
 
     def get_task_for_compare_and_sync(self, am_id: str) -> Task | str:
         task_page = self._get_task_pages_by_am_id(am_id)
         if task_page != "No page returned!":
-            task_dto = self._convert_task_response_to_dto(task_page[0])
+            # Comparing only reads a few fields, so relation titles are resolved on demand
+            task_dto = self._convert_task_response_to_dto(task_page[0], lazy=True)
             return task_dto
         else:
             return task_page
 
+    def get_tasks_edited_since_last_sync(self) -> List[Task]:
+        """
+        Get every task edited since the last sync that called commit_tasks_watermark, oldest edit first.
+
+        Calling this again before committing returns the same tasks (plus any newer edits).
+        """
+        task_pages = self._get_task_pages_by_last_edited()
+        return self._convert_task_responses_to_dtos(task_pages)
+
+    def commit_tasks_watermark(self):
+        """Mark the tasks returned by get_tasks_edited_since_last_sync as synced"""
+        self._commit_task_pages_watermark()
+
+    def get_tasks_for_compare_and_sync(self, am_ids: List[str]) -> Dict[str, Task]:
+        """
+        Bulk version of get_task_for_compare_and_sync.
+
+        Args:
+            am_ids: Amazing Marvin IDs of the tasks to look up
+
+        Returns:
+            A map of AM ID -> Notion task; IDs with no Notion task are left out
+        """
+        task_pages = self._get_task_pages_by_am_ids(am_ids)
+        task_dtos = {}
+        for am_id, pages in task_pages.items():
+            task_dtos[am_id] = self._convert_task_response_to_dto(pages[0], lazy=True)
+        return task_dtos
+
+    def resolve_task_relations(self, tasks: List[Task]) -> List[Task]:
+        """
+        Resolve the relation titles of lazily converted tasks in one pass, instead of one lookup per
+        field read.
+        """
+        self._resolve_task_relations(tasks)
+        return tasks
+
+    def get_task_pages_in_date_range(self, start_date: Timecube, end_date: Timecube) -> Dict[str, List[dict]]:
+        """
+        Get the task pages scheduled on each day from start_date to end_date (inclusive) with one query.
+
+        Args:
+            start_date: First day of the window
+            end_date: Last day of the window
+
+        Returns:
+            A map of "YYYY-MM-DD" -> task pages scheduled on that day, with an entry for every day in the
+            window. Single-day lookups inside the window afterwards are served from the same query.
+        """
+        return self._get_task_pages_by_scheduled_date_range(start_date, end_date)
+
     def get_tasks_for_date_and_next_6_days(self, start_date: Timecube) -> Tuple[List[Task], List[Task]]:
         """
         Get tasks scheduled for a specific day and tasks scheduled for that day plus the next 6 days.
@@ -66,25 +121,11 @@ class NotionManager(NotionPageSpecific, NotionTransformer):
             - List of tasks scheduled for the specific day
             - List of tasks scheduled for the specific day and the next 6 days
         """
-        # Get tasks for the specific day
-        tasks_for_day = self._get_task_pages_by_scheduled_date(start_date)
-        tasks_for_day_list = []
-
-        if tasks_for_day != "No page returned!":
-            for page in tasks_for_day:
-                tasks_for_day_list.append(page)
-
-        # Get tasks for the next 7 days (including the specific day)
-        end_date = Timecube.from_datetime(start_date.date_in_datetime + timedelta(days=6))
-        start_date = Timecube.from_datetime(start_date.date_in_datetime + timedelta(days=1))
-        tasks_for_week_list = tasks_for_day_list.copy()
-        while start_date.date_in_datetime <= end_date.date_in_datetime:
-            tasks_for_week = self._get_task_pages_by_scheduled_date(start_date)
-            if tasks_for_week != "No page returned!":
-                for page in tasks_for_week:
-                    tasks_for_week_list.append(page)
-            start_date = Timecube.from_datetime(start_date.date_in_datetime + timedelta(days=1))
+        end_date = start_date.add_timedelta(timedelta(days=6))
+        tasks_by_day = self.get_task_pages_in_date_range(start_date, end_date)
 
+        tasks_for_day_list = list(tasks_by_day[start_date.date_Y_m_d])
+        tasks_for_week_list = [page for pages in tasks_by_day.values() for page in pages]
         return tasks_for_day_list, tasks_for_week_list
 
     def get_tasks_to_delete(self) -> List[Task]:
@@ -95,17 +136,24 @@ class NotionManager(NotionPageSpecific, NotionTransformer):
         if task_pages == "No page returned!":
             return []
 
-        tasks = []
-        for page in task_pages:
-            task = self._convert_task_response_to_dto(page)
-            tasks.append(task)
-
-        return tasks
+        return self._convert_task_responses_to_dtos(task_pages)
 
     def get_tracker_data(self):
         weight, bodyfat, heat_loan, credit_card, fed_student, prim_mort, sec_mort = self._get_tracker_data_most_recent()
         return weight, bodyfat, heat_loan, credit_card, fed_student, prim_mort, sec_mort
 
+    def get_tracker_values(self, tracker_titles: List[str]) -> Dict[str, float | None]:
+        """
+        Get the current value of any set of trackers with a single query.
+
+        Args:
+            tracker_titles: Names of the trackers to read
+
+        Returns:
+            A map of tracker name -> current value; trackers that don't exist are left out
+        """
+        return self._get_tracker_values_most_recent(tracker_titles)
+
     def delete_task(self, task: Task):
         return self._delete_page_by_id(task.notion_id)
 
@@ -161,7 +209,8 @@ class NotionManager(NotionPageSpecific, NotionTransformer):
             timecube, training_status, training_description, training_readiness, daily_average_stress)
 
     def update_calories_out_in_daily_tracking(self, timecube: Timecube, calories_out: int):
-        return self._update_daily_tracking_page(timecube, "Calories Out", "number", calories_out)
+        return self._update_daily_tracking_page(
+            timecube, "Calories Out", "number", calories_out, skip_unchanged=True)
 
     def update_daily_insights_block(self, daily_insights: List[Insight]):
         blocks = self._get_block_children_by_id(self.insight_block_id)
@@ -215,7 +264,8 @@ class NotionManager(NotionPageSpecific, NotionTransformer):
 
     def update_menstrual_cycle_for_today(self, menstrual_cycle_day: int):
         today_timecube = Timecube.from_datetime(datetime.today())
-        return self._update_daily_tracking_page(today_timecube, "Cycle Day", "number", menstrual_cycle_day)
+        return self._update_daily_tracking_page(
+            today_timecube, "Cycle Day", "number", menstrual_cycle_day, skip_unchanged=True)
 
     def update_mood_in_daily_tracking_and_mood_tracker(self, mood: int, timecube: Timecube):
         mood_str = self._convert_mood_int_to_str(mood)
@@ -260,8 +310,10 @@ class NotionManager(NotionPageSpecific, NotionTransformer):
         Update existing step counts
         """
         today_timecube = Timecube.from_datetime(datetime.today())
-        dt_steps_response = self._update_daily_tracking_page(today_timecube, "Steps", "number", steps)
-        steps_response = self._update_steps_page_with_steps(today_timecube, steps, total_distance)
+        with self._coalesced_writes():
+            dt_steps_response = self._update_daily_tracking_page(
+                today_timecube, "Steps", "number", steps, skip_unchanged=True)
+            steps_response = self._update_steps_page_with_steps(today_timecube, steps, total_distance)
         return dt_steps_response, steps_response
 
     def update_task_dependencies(self, task: Task) -> str:
@@ -281,21 +333,22 @@ class NotionManager(NotionPageSpecific, NotionTransformer):
     def update_training_entries_for_today(self, training_status: str, training_readiness: int,
                                           readiness_description: str, daily_average_stress: int):
         today_timecube = Timecube.from_datetime(datetime.today())
-        # update Daily Tracking Page
-        status_properties = [{"text": {"content": training_status}}]
-        readiness_properties = [{"text": {"content": readiness_description}}]
-        status_daily_response = self._update_daily_tracking_page(
-            today_timecube, "Training Status", "rich_text", status_properties)
-        readiness_daily_response = self._update_daily_tracking_page(
-            today_timecube, "Readiness Score", "number", training_readiness)
-        description_daily_response = self._update_daily_tracking_page(
-            today_timecube, "Readiness Description", "rich_text", readiness_properties)
-        stress_daily_response = self._update_daily_tracking_page(
-            today_timecube, "Average Stress", "number", daily_average_stress)
-
-        # update Stats Page for day
-        stats_response = self._update_training_page(
-            today_timecube, training_status, readiness_description, training_readiness, daily_average_stress)
+        with self._coalesced_writes():
+            # update Daily Tracking Page
+            status_properties = [{"text": {"content": training_status}}]
+            readiness_properties = [{"text": {"content": readiness_description}}]
+            status_daily_response = self._update_daily_tracking_page(
+                today_timecube, "Training Status", "rich_text", status_properties, skip_unchanged=True)
+            readiness_daily_response = self._update_daily_tracking_page(
+                today_timecube, "Readiness Score", "number", training_readiness, skip_unchanged=True)
+            description_daily_response = self._update_daily_tracking_page(
+                today_timecube, "Readiness Description", "rich_text", readiness_properties, skip_unchanged=True)
+            stress_daily_response = self._update_daily_tracking_page(
+                today_timecube, "Average Stress", "number", daily_average_stress, skip_unchanged=True)
+
+            # update Stats Page for day
+            stats_response = self._update_training_page(
+                today_timecube, training_status, readiness_description, training_readiness, daily_average_stress)
 
         return status_daily_response, readiness_daily_response, \
             description_daily_response, stress_daily_response, stats_response
@@ -303,30 +356,35 @@ class NotionManager(NotionPageSpecific, NotionTransformer):
     def update_training_entries_for_yesterday(self, training_status: str, training_readiness: int,
                                           readiness_description: str, daily_average_stress: int):
         yesterday_timecube = Timecube.from_datetime(datetime.today() - timedelta(days=1))
-        # update Daily Tracking Page
-        status_properties = [{"text": {"content": training_status}}]
-        readiness_properties = [{"text": {"content": readiness_description}}]
-        status_daily_response = self._update_daily_tracking_page(
-            yesterday_timecube, "Training Status", "rich_text", status_properties)
-        readiness_daily_response = self._update_daily_tracking_page(
-            yesterday_timecube, "Readiness Score", "number", training_readiness)
-        description_daily_response = self._update_daily_tracking_page(
-            yesterday_timecube, "Readiness Description", "rich_text", readiness_properties)
-        stress_daily_response = self._update_daily_tracking_page(
-            yesterday_timecube, "Average Stress", "number", daily_average_stress)
-
-        # update Stats Page for day
-        stats_response = self._update_training_page(
-            yesterday_timecube, training_status, readiness_description, training_readiness, daily_average_stress)
+        with self._coalesced_writes():
+            # update Daily Tracking Page
+            status_properties = [{"text": {"content": training_status}}]
+            readiness_properties = [{"text": {"content": readiness_description}}]
+            status_daily_response = self._update_daily_tracking_page(
+                yesterday_timecube, "Training Status", "rich_text", status_properties, skip_unchanged=True)
+            readiness_daily_response = self._update_daily_tracking_page(
+                yesterday_timecube, "Readiness Score", "number", training_readiness, skip_unchanged=True)
+            description_daily_response = self._update_daily_tracking_page(
+                yesterday_timecube, "Readiness Description", "rich_text", readiness_properties, skip_unchanged=True)
+            stress_daily_response = self._update_daily_tracking_page(
+                yesterday_timecube, "Average Stress", "number", daily_average_stress, skip_unchanged=True)
+
+            # update Stats Page for day
+            stats_response = self._update_training_page(
+                yesterday_timecube, training_status, readiness_description, training_readiness, daily_average_stress)
 
         return status_daily_response, readiness_daily_response, \
             description_daily_response, stress_daily_response, stats_response
 
     def update_weight_bodyfat_hrv_for_today(self, weight: int, body_fat: int, hrv: int):
         today_timecube = Timecube.from_datetime(datetime.today())
-        weight_tracker = self._post_new_weight_tracker_entry(today_timecube, weight)
-        body_fat_tracker = self._post_new_body_fat_tracker_entry(today_timecube, body_fat)
-        weight_daily_response = self._update_daily_tracking_page(today_timecube, "Weight", "number", weight)
-        bf_daily_response = self._update_daily_tracking_page(today_timecube, "Body Fat", "number", body_fat)
-        hrv_daily_response = self._update_daily_tracking_page(today_timecube, "HRV", "number", hrv)
+        with self._coalesced_writes():
+            weight_tracker = self._post_new_weight_tracker_entry(today_timecube, weight)
+            body_fat_tracker = self._post_new_body_fat_tracker_entry(today_timecube, body_fat)
+            weight_daily_response = self._update_daily_tracking_page(
+                today_timecube, "Weight", "number", weight, skip_unchanged=True)
+            bf_daily_response = self._update_daily_tracking_page(
+                today_timecube, "Body Fat", "number", body_fat, skip_unchanged=True)
+            hrv_daily_response = self._update_daily_tracking_page(
+                today_timecube, "HRV", "number", hrv, skip_unchanged=True)
         return weight_tracker, body_fat_tracker, weight_daily_response, bf_daily_response, hrv_daily_response
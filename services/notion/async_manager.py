@@ -0,0 +1,236 @@
+from data_models.sleep import Sleep
+from data_models.timecube import Timecube
+from services.notion import NotionManager
+from services.notion.scheduler import NotionRequestScheduler
+
+from datetime import datetime
+from notion_client import AsyncClient
+from typing import Any, Awaitable, Callable, List
+import asyncio
+import os
+
+
+class AsyncNotionManager(NotionManager):
+    """
+    NotionManager that can also run independent Notion calls concurrently.
+
+    The *_async methods use notion_client's AsyncClient and share one concurrency limit, so awaiting many
+    of them together takes about as long as the slowest call. They have to run inside run(), which opens
+    the async client for one event loop and closes it afterwards:
+
+        notion_service.run(
+            notion_service.update_weight_bodyfat_hrv_for_today_async(weight, body_fat, hrv),
+            notion_service.update_menstrual_cycle_for_today_async(cycle_day))
+
+    Page updates made inside one run() are coalesced into a single PATCH per page (see _coalesced_writes).
+    Caches, the reference index and every synchronous method are shared with NotionManager.
+    """
+    MAX_CONCURRENT_REQUESTS = 3
+
+    def __init__(self, max_concurrent_requests: int = None):
+        super().__init__()
+        self.max_concurrent_requests = max_concurrent_requests or self.MAX_CONCURRENT_REQUESTS
+        self.async_client = None
+        self._request_slots = None
+        self._queries_in_flight = {}  # cache key -> task, so concurrent identical lookups share one request
+
+    def run(self, *coroutines: Awaitable) -> List[Any]:
+        """Run coroutines concurrently on a fresh async client and return their results in order"""
+        return asyncio.run(self._run_in_session(coroutines))
+
+    async def _run_in_session(self, coroutines) -> List[Any]:
+        self.async_client = AsyncClient(auth=os.getenv("NOTION_TOKEN"))
+        self._request_slots = asyncio.Semaphore(self.max_concurrent_requests)
+        try:
+            # Updates to the same page from different coroutines go out as one PATCH once they all finish
+            with self._coalesced_writes():
+                try:
+                    results = list(await asyncio.gather(*coroutines))
+                except BaseException:
+                    # Don't push a half-finished run to Notion (or block the loop doing it synchronously)
+                    if self._write_buffer_depth == 1:
+                        discarded = self._take_buffered_writes()
+                        print(f"Discarded {len(discarded)} buffered Notion page updates after an error")
+                    raise
+                if self._write_buffer_depth == 1:
+                    await self._async_flush_writes()
+            return results
+        finally:
+            await self.async_client.aclose()
+            self.async_client = None
+            self._request_slots = None
+            self._queries_in_flight = {}
+
+    async def _async_request(self, endpoint: Callable[..., Awaitable], priority: str = NotionRequestScheduler.READ,
+                             **kwargs) -> Any:
+        """
+        Every async Notion call goes through here so they all share the concurrency limit and, with the
+        synchronous calls, the rate limit and retries
+        """
+        if self.async_client is None:
+            raise RuntimeError("Async Notion calls must be awaited inside AsyncNotionManager.run()")
+        async with self._request_slots:
+            return await self._scheduler.call_async(endpoint, priority, **kwargs)
+
+    """
+    Async GET/POST/PATCH primitives
+    """
+    async def _async_query_database_pages(self, database_id: str, query_filter: dict = None,
+                                          sorts: List[dict] = None, page_size: int = 100,
+                                          limit: int = None) -> List[dict]:
+        """Async counterpart of _query_database_pages, collecting the pages into a list"""
+        query = self._start_query(database_id, query_filter, sorts, page_size, limit)
+        pages = []
+        round_trips = 0
+        try:
+            while True:
+                response = await self._async_request(self.async_client.databases.query, **query)
+                round_trips += 1
+                pages.extend(response["results"])
+                if limit is not None and len(pages) >= limit:
+                    del pages[limit:]
+                    break
+                cursor = self._next_query_cursor(response)
+                if cursor is None:
+                    break
+                query["start_cursor"] = cursor
+        finally:
+            self._finish_query(database_id, round_trips, len(pages))
+        return pages
+
+    async def _async_query_database(self, database_id: str, query_filter: dict = None, sorts: List[dict] = None,
+                                    page_size: int = 100, limit: int = None) -> str | List[dict]:
+        return self._pages_or_none_returned(
+            await self._async_query_database_pages(database_id, query_filter, sorts, page_size, limit))
+
+    async def _async_share_query(self, cache_key: tuple, query: Callable[[], Awaitable]) -> Any:
+        """Run query, or wait for the identical one already running, so concurrent lookups share one request"""
+        in_flight = self._queries_in_flight.get(cache_key)
+        if in_flight is None:
+            in_flight = asyncio.ensure_future(query())
+            self._queries_in_flight[cache_key] = in_flight
+            in_flight.add_done_callback(lambda _: self._queries_in_flight.pop(cache_key, None))
+        return await in_flight
+
+    async def _async_get_cached_query(self, cache_key: tuple, database_id: str, query_filter: dict) -> str | List[dict]:
+        cached = self._database_query_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        async def query():
+            pages = await self._async_query_database(database_id, query_filter)
+            self._database_query_cache.set(cache_key, pages, database_id)
+            return pages
+        return await self._async_share_query(cache_key, query)
+
+    async def _async_get_all_database_pages(self, database_id: str) -> List[dict]:
+        # Same caches, in memory and on disk, as the synchronous _get_all_database_pages
+        cache_key, pages, use_disk_cache = self._get_cached_all_database_pages(database_id)
+        if pages is not None:
+            return pages
+
+        async def query():
+            all_pages = await self._async_query_database_pages(database_id)
+            self._cache_all_database_pages(database_id, cache_key, all_pages, use_disk_cache)
+            return all_pages
+        return await self._async_share_query(cache_key, query)
+
+    async def _async_get_reference_pages_by_title(self, database_id: str, title_field: str,
+                                                  title: str) -> str | List[dict]:
+        # Resolved through the same reference index as the synchronous _get_reference_pages_by_title
+        if database_id not in self._reference_indexes:
+            pages = await self._async_get_all_database_pages(database_id)
+            if database_id not in self._reference_indexes:  # Another coroutine may have indexed it meanwhile
+                self._index_reference_pages(database_id, title_field, pages)
+        return self._reference_pages_matching(self._reference_indexes[database_id], title)
+
+    async def _async_get_database_pages_by_date_field(self, database_id: str, field_name: str,
+                                                      field_value: Timecube) -> str | List[dict]:
+        # Shares cache keys with the synchronous _get_database_pages_by_date_field
+        cache_key = self._generate_cache_key("date", database_id, field_name, field_value.date_Y_m_d)
+        return await self._async_get_cached_query(cache_key, database_id, {
+            "and": [{
+                "property": field_name,
+                "date": {"equals": field_value.date_Y_m_d}
+            }]
+        })
+
+    async def _async_flush_writes(self) -> List[dict]:
+        return list(await asyncio.gather(*(self._async_send_page_update(update)
+                                           for update in self._take_buffered_writes())))
+
+    async def _async_send_page_update(self, update: dict) -> dict:
+        request = self._prepare_page_update(update)
+        if request is None:
+            return self._skipped_page_update(update["page_id"])
+        response = await self._async_request(self.async_client.pages.update, NotionRequestScheduler.WRITE, **request)
+        return self._finish_page_update(update, request, response)
+
+    async def _async_update_database_page(self, page_id: str, fields: dict, skip_unchanged: bool = False) -> dict:
+        if self._write_buffer is not None:
+            return self._buffer_write(page_id, properties=fields, skip_unchanged=skip_unchanged)
+        return await self._async_send_page_update(
+            {"page_id": page_id, "properties": fields, "skip_unchanged": set(fields) if skip_unchanged else set()})
+
+    async def _async_update_page_icon(self, page_id: str, icon: dict) -> dict:
+        if self._write_buffer is not None:
+            return self._buffer_write(page_id, icon=icon)
+        return await self._async_send_page_update({"page_id": page_id, "icon": icon})
+
+    async def _async_post_new_database_page(self, database_id: str, properties: dict) -> dict:
+        response = await self._async_request(
+            self.async_client.pages.create, NotionRequestScheduler.WRITE,
+            parent={"database_id": database_id}, properties=properties)
+        return self._write_through(response["id"], response, database_id)
+
+    async def _async_update_page_found_by_date(self, database_id: str, date_field: str, timecube: Timecube,
+                                               properties: dict) -> dict:
+        # Only the tracking pages are found by date, and their values come from Garmin alone
+        page_id = (await self._async_get_database_pages_by_date_field(database_id, date_field, timecube))[0]["id"]
+        return await self._async_update_database_page(page_id, properties, skip_unchanged=True)
+
+    async def _async_update_daily_tracking_page(self, timecube: Timecube, field: str, field_type: str,
+                                                value: str | int) -> dict:
+        return await self._async_update_page_found_by_date(
+            self.daily_tracking_database_id, "Date", timecube, {field: {field_type: value}})
+
+    async def _async_post_new_tracker_entry(self, tracker_title: str, entry_name: str, timecube: Timecube,
+                                            value: float, unit: str) -> dict:
+        tracker_pages = await self._async_get_reference_pages_by_title(self.tracker_database_id, "Name", tracker_title)
+        properties = self._create_tracker_entry_properties(tracker_pages[0]["id"], entry_name, timecube, value, unit)
+        return await self._async_post_new_database_page(self.tracker_entry_database_id, properties)
+
+    """
+    Public async functions
+    """
+    async def create_sleep_page_async(self, sleep: Sleep) -> dict | str:
+        if sleep.total_sleep == 0:
+            return f"Skipping sleep data for {sleep.start_time.date_Y_m_d} as total sleep is 0"
+        sleep_page = await self._async_post_new_database_page(
+            self.sleep_database_id, self._create_sleep_properties(sleep))
+        return await self._async_update_page_icon(sleep_page["id"], {"emoji": "😴"})
+
+    async def create_steps_page_async(self, timecube: Timecube, steps: int, total_distance: int) -> str:
+        steps_page = await self._async_post_new_database_page(
+            self.steps_database_id, self._create_steps_properties(timecube, steps, total_distance))
+        return steps_page["id"]
+
+    async def create_today_training_page_async(self, training_status: str, training_readiness: int,
+                                               training_description: str, daily_average_stress: int) -> dict:
+        timecube = Timecube.from_datetime(datetime.today())
+        properties = self._create_training_properties(
+            timecube, training_status, training_description, training_readiness, daily_average_stress)
+        return await self._async_post_new_database_page(self.stats_database_id, properties)
+
+    async def update_menstrual_cycle_for_today_async(self, menstrual_cycle_day: int) -> dict:
+        today_timecube = Timecube.from_datetime(datetime.today())
+        return await self._async_update_daily_tracking_page(today_timecube, "Cycle Day", "number", menstrual_cycle_day)
+
+    async def update_weight_bodyfat_hrv_for_today_async(self, weight: int, body_fat: int, hrv: int):
+        today_timecube = Timecube.from_datetime(datetime.today())
+        return await asyncio.gather(
+            self._async_post_new_tracker_entry("Weight", "Weight Log", today_timecube, weight, "percent"),
+            self._async_post_new_tracker_entry("Body Fat", "Body Fat Log", today_timecube, body_fat, "percent"),
+            self._async_update_daily_tracking_page(today_timecube, "Weight", "number", weight),
+            self._async_update_daily_tracking_page(today_timecube, "Body Fat", "number", body_fat),
+            self._async_update_daily_tracking_page(today_timecube, "HRV", "number", hrv))
@@ -1,23 +1,155 @@
 from data_models.timecube import Timecube
+from services.notion.cache import NotionCache
 from services.notion.config import NotionConfig
+from services.notion.disk_cache import NotionDiskCache
+from services.notion.fingerprints import NotionWriteFingerprints
+from services.notion.reference_index import NotionReferenceIndex
+from services.notion.scheduler import NotionRequestScheduler
+from services.sync_state import SyncStateStore
 
-from datetime import datetime, timedelta
-from typing import List, Dict, Tuple, Any
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Tuple, Any, Iterable, Iterator
 
 class NotionBasic(NotionConfig):
     """
     Generic GET/POST functions for Notion
     """
+    # Cache lifetimes in seconds
+    PAGE_CACHE_TTL = 300
+    QUERY_CACHE_TTL = 60
+    REFERENCE_CACHE_TTL = 3600
+    # Parallel pages.retrieve calls while prefetching related pages
+    PREFETCH_WORKERS = 3
 
     def __init__(self):
         super().__init__()
-        # Add cache dictionaries
-        self._page_cache = {}  # Cache for pages by ID
-        self._database_query_cache = {}  # Cache for database queries
-
-    def _generate_cache_key(self, *args) -> str:
+        # Reference databases rarely change during a run, everything else is cached only briefly
+        reference_ttls = {database_id: self.REFERENCE_CACHE_TTL
+                          for database_id in self.reference_database_ids if database_id}
+        self._page_cache = NotionCache(self.PAGE_CACHE_TTL, reference_ttls)  # Cache for pages by ID
+        self._database_query_cache = NotionCache(self.QUERY_CACHE_TTL, reference_ttls)  # Cache for database queries
+        # Reference-database lookups shared across runs, if NOTION_DISK_CACHE_PATH is set
+        self._disk_cache = NotionDiskCache(self.disk_cache_path) if self.disk_cache_path else None
+        self._disk_cache_validated = set()  # Databases whose disk entries were revalidated in this run
+        # Round trips used by the most recent database query, and across the whole run
+        self.last_query_round_trips = 0
+        self.total_query_round_trips = 0
+        # Paces and retries every Notion call, shared with every other Notion service in the process
+        self._scheduler = NotionRequestScheduler.shared()
+        # Page updates held back by _coalesced_writes, keyed by normalized page ID
+        self._write_buffer = None
+        self._write_buffer_depth = 0
+        self.coalesced_write_count = 0  # Updates merged into another update instead of sent on their own
+        # Hashes of the values last written, so unchanged rewrites can be dropped
+        self._write_fingerprints = NotionWriteFingerprints(self._disk_cache)
+        self.skipped_write_count = 0  # Page updates not sent because nothing in them had changed
+        # Cursors that incremental syncs advance only after they succeed
+        self._sync_state = SyncStateStore()
+        self._pending_watermarks = {}  # Database ID -> watermark waiting for its sync to succeed
+
+    def _request(self, endpoint, priority: str = NotionRequestScheduler.READ, **kwargs) -> Any:
+        """Every synchronous Notion call goes through here so they all share the rate limit"""
+        return self._scheduler.call(endpoint, priority, **kwargs)
+
+    def _generate_cache_key(self, *args) -> tuple:
         """Generate a cache key from the arguments"""
-        return str(hash(str(args)))
+        return args
+
+    def _query_database_pages(self, database_id: str, query_filter: dict = None, sorts: List[dict] = None,
+                              page_size: int = 100, limit: int = None) -> Iterator[dict]:
+        """
+        Stream the pages matching a database query, one cursor chunk at a time.
+
+        Follows start_cursor/has_more until the result set is exhausted, so filters matching more than
+        100 pages are read completely without holding every chunk in memory. Iteration stops early once
+        `limit` pages have been yielded, or whenever the caller stops consuming the generator.
+        """
+        query = self._start_query(database_id, query_filter, sorts, page_size, limit)
+        round_trips = 0
+        yielded = 0
+        try:
+            while True:
+                response = self._request(self.client.databases.query, **query)
+                round_trips += 1
+                for page in response["results"]:
+                    yield page
+                    yielded += 1
+                    if limit is not None and yielded >= limit:
+                        return
+                cursor = self._next_query_cursor(response)
+                if cursor is None:
+                    return
+                query["start_cursor"] = cursor
+        finally:
+            self._finish_query(database_id, round_trips, yielded)
+
+    def _query_database(self, database_id: str, query_filter: dict = None, sorts: List[dict] = None,
+                        page_size: int = 100, limit: int = None) -> str | List[dict]:
+        """Collect every page from _query_database_pages, or "No page returned!" if nothing matched"""
+        return self._pages_or_none_returned(
+            list(self._query_database_pages(database_id, query_filter, sorts, page_size, limit)))
+
+    """
+    Query pagination helpers, shared with the async queries in AsyncNotionManager
+    """
+    @staticmethod
+    def _start_query(database_id: str, query_filter: dict = None, sorts: List[dict] = None,
+                     page_size: int = 100, limit: int = None) -> dict:
+        """databases.query arguments for the first chunk of a query"""
+        query = {
+            "database_id": database_id,
+            "page_size": max(1, min(page_size, limit or page_size, 100))
+        }
+        if query_filter:
+            query["filter"] = query_filter
+        if sorts:
+            query["sorts"] = sorts
+        return query
+
+    @staticmethod
+    def _next_query_cursor(response: dict) -> str | None:
+        """start_cursor for the next chunk, or None once the result set is exhausted"""
+        if not response.get("has_more"):
+            return None
+        return response.get("next_cursor")
+
+    def _finish_query(self, database_id: str, round_trips: int, page_count: int):
+        self.last_query_round_trips = round_trips
+        self.total_query_round_trips += round_trips
+        if round_trips > 1:
+            print(f"Notion query on {database_id} returned {page_count} pages in {round_trips} round trips")
+
+    @staticmethod
+    def _pages_or_none_returned(pages: List[dict]) -> str | List[dict]:
+        if not pages:
+            return "No page returned!"
+        return pages
+
+    def _is_disk_cached(self, database_id: str) -> bool:
+        """
+        Whether lookups on this database can be served from the disk cache. The first time a database is
+        used in a run, one query checks whether any of its pages were edited since the cache was last
+        validated, and the database's entries are dropped if so.
+        """
+        if self._disk_cache is None or not self._is_reference_database(database_id):
+            return False
+
+        if database_id not in self._disk_cache_validated:
+            validation_started = datetime.now(timezone.utc)
+            edited_since = self._disk_cache.edited_since(database_id)
+            if edited_since:
+                edited_pages = self._query_database(database_id, {
+                    "timestamp": "last_edited_time",
+                    "last_edited_time": {"on_or_after": edited_since}
+                }, limit=1)
+                if edited_pages != "No page returned!":
+                    print(f"Pages in {database_id} changed since {edited_since}, refreshing the disk cache")
+                    self._disk_cache.invalidate_database(database_id)
+            self._disk_cache.mark_validated(database_id, validation_started)
+            self._disk_cache_validated.add(database_id)
+        return True
 
     def _get_database_pages_by_checkbox_field(self, database_id: str, field_name: str, field_value: bool) -> str | List[
         dict]:
@@ -25,25 +157,20 @@ class NotionBasic(NotionConfig):
         cache_key = self._generate_cache_key("checkbox", database_id, field_name, field_value)
 
         # Check cache first
-        if cache_key in self._database_query_cache:
-            return self._database_query_cache[cache_key]
+        cached = self._database_query_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         # If not in cache, make the API call
-        pages = "No page returned!"
-        query = self.client.databases.query(
-            database_id=database_id,
-            filter={
-                "and": [{
-                    "property": field_name,
-                    "checkbox": {"equals": field_value}
-                }]
-            }
-        )
-        if query['results']:
-            pages = query['results']
+        pages = self._query_database(database_id, {
+            "and": [{
+                "property": field_name,
+                "checkbox": {"equals": field_value}
+            }]
+        })
 
         # Store in cache
-        self._database_query_cache[cache_key] = pages
+        self._database_query_cache.set(cache_key, pages, database_id)
         return pages
 
     def _get_database_pages_by_date_field(self, database_id: str, field_name: str, field_value: Timecube) -> str | List[dict]:
@@ -51,147 +178,299 @@ class NotionBasic(NotionConfig):
         cache_key = self._generate_cache_key("date", database_id, field_name, field_value.date_Y_m_d)
 
         # Check cache first
-        if cache_key in self._database_query_cache:
-            return self._database_query_cache[cache_key]
+        cached = self._database_query_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         # If not in cache, make the API call
-        pages = "No page returned!"
-        query = self.client.databases.query(
-            database_id=database_id,
-            filter={
-                "and": [{
-                    "property": field_name,
-                    "date": {"equals": field_value.date_Y_m_d}
-                }]
-            }
-        )
-        if query['results']:
-            pages = query['results']
+        pages = self._query_database(database_id, {
+            "and": [{
+                "property": field_name,
+                "date": {"equals": field_value.date_Y_m_d}
+            }]
+        })
 
         # Store in cache
-        self._database_query_cache[cache_key] = pages
+        self._database_query_cache.set(cache_key, pages, database_id)
         return pages
 
-    def _get_database_pages_by_last_edited(self, database_id: str, minutes_in_the_past: int) -> List[dict]:
-        # Note: Caching for this method has limited effectiveness since it depends on the current time
-        # Generate cache key - include a timestamp rounded to the nearest minute to allow some caching
-        current_minute = int(datetime.now().timestamp() / 60)
-        cache_key = self._generate_cache_key("last_edited", database_id, minutes_in_the_past, current_minute)
-
-        # Check cache first
-        if cache_key in self._database_query_cache:
-            return self._database_query_cache[cache_key]
+    def _watermark_key(self, database_id: str) -> str:
+        return f"notion:last_edited:{NotionCache.normalize_id(database_id)}"
+
+    def _get_database_pages_by_last_edited(self, database_id: str, minutes_in_the_past: int = 60) -> List[dict]:
+        """
+        Every page edited since the database's committed watermark, oldest edit first.
+
+        The watermark is the newest last_edited_time already processed plus the IDs of the pages seen at
+        that time: Notion rounds last_edited_time to the minute, so the query starts at the watermark
+        itself and drops pages that were already seen there. Without a watermark (the first run), the
+        last `minutes_in_the_past` are read.
+
+        The watermark past these pages is only stored by _commit_database_watermark, once they have been
+        synced successfully, so a failed sync is redone by the next run.
+        """
+        watermark = self._sync_state.get(self._watermark_key(database_id))
+        if watermark:
+            edited_since = watermark["last_edited_time"]
+            seen_ids = set(watermark.get("seen_ids", []))
+        else:
+            edited_since = (datetime.now(timezone.utc) - timedelta(minutes=minutes_in_the_past)).isoformat(
+                timespec="seconds")
+            seen_ids = set()
 
-        # If not in cache, make the API call
-        search_datetime = datetime.now() - timedelta(minutes=minutes_in_the_past)
         pages = []
-        query = self.client.databases.query(
-            database_id=database_id,
-            filter={
-                "timestamp": "last_edited_time",
-                    "last_edited_time": {
-                    "on_or_after": search_datetime.isoformat(timespec='seconds')
-                },
-            }
-        )
-        if query['results']:
-            pages = query['results']
-
-        # Store in cache
-        self._database_query_cache[cache_key] = pages
+        for page in self._query_database_pages(
+                database_id,
+                {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": edited_since}},
+                sorts=[{"timestamp": "last_edited_time", "direction": "ascending"}]):
+            if page["last_edited_time"] == edited_since and NotionCache.normalize_id(page["id"]) in seen_ids:
+                continue
+            pages.append(page)
+
+        if pages:
+            newest = max(page["last_edited_time"] for page in pages)
+            newest_ids = {NotionCache.normalize_id(page["id"]) for page in pages
+                          if page["last_edited_time"] == newest}
+            if newest == edited_since:
+                newest_ids |= seen_ids
+            self._pending_watermarks[database_id] = {"last_edited_time": newest, "seen_ids": sorted(newest_ids)}
+        elif not watermark:
+            self._pending_watermarks[database_id] = {"last_edited_time": edited_since, "seen_ids": []}
         return pages
 
+    def _commit_database_watermark(self, database_id: str):
+        """Advance the database's watermark past the pages last returned by _get_database_pages_by_last_edited"""
+        watermark = self._pending_watermarks.pop(database_id, None)
+        if watermark is not None:
+            self._sync_state.set(self._watermark_key(database_id), watermark)
+
     def _get_database_pages_by_start_and_end_date_field(self, database_id: str, start_date: Timecube, end_date: Timecube) -> str | List[dict]:
         # Generate cache key
         cache_key = self._generate_cache_key("start_end_date", database_id, start_date.date_Y_m_d, end_date.date_Y_m_d)
 
         # Check cache first
-        if cache_key in self._database_query_cache:
-            return self._database_query_cache[cache_key]
+        cached = self._database_query_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         # If not in cache, make the API call
-        pages = "No page returned!"
-        query = self.client.databases.query(
-            database_id=database_id,
-            filter={
-                "and": [
-                    {"property": "Start Date", "date": {"on_or_before": start_date.date_Y_m_d}},
-                    {"property": "End Date", "date": {"on_or_after": end_date.date_Y_m_d}}
-                ]
-            }
-        )
-        if query['results']:
-            pages = query['results']
+        pages = self._query_database(database_id, {
+            "and": [
+                {"property": "Start Date", "date": {"on_or_before": start_date.date_Y_m_d}},
+                {"property": "End Date", "date": {"on_or_after": end_date.date_Y_m_d}}
+            ]
+        })
 
         # Store in cache
-        self._database_query_cache[cache_key] = pages
+        self._database_query_cache.set(cache_key, pages, database_id)
         return pages
 
+    def _get_database_pages_by_date_range(self, database_id: str, field_name: str, start_date: Timecube,
+                                          end_date: Timecube) -> Dict[str, List[dict]]:
+        """
+        Pages whose date field falls between start_date and end_date (inclusive), bucketed by day.
+
+        One paginated on_or_after/on_or_before query covers the whole window. Pages are bucketed by the
+        local date their date field starts on, every day in the window gets a bucket (empty if nothing
+        is on it), and each day is also cached under the key _get_database_pages_by_date_field uses, so
+        later single-day lookups inside the window don't query again. Likewise a window whose days are
+        all cached already, from this or an overlapping wider window, is served from those day buckets.
+
+        Returns:
+            A map of "YYYY-MM-DD" -> pages, in date order
+        """
+        first_day = start_date.date_in_datetime.date()
+        last_day = end_date.date_in_datetime.date()
+        pages_by_day = {(first_day + timedelta(days=offset)).isoformat(): []
+                        for offset in range((last_day - first_day).days + 1)}
+
+        cache_key = self._generate_cache_key("date_range", database_id, field_name,
+                                             first_day.isoformat(), last_day.isoformat())
+        cached = self._database_query_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        day_keys = {day: self._generate_cache_key("date", database_id, field_name, day) for day in pages_by_day}
+        cached_days = {day: self._database_query_cache.get(day_key) for day, day_key in day_keys.items()}
+        if all(pages is not None for pages in cached_days.values()):
+            return {day: [] if pages == "No page returned!" else list(pages) for day, pages in cached_days.items()}
+
+        for page in self._query_database_pages(database_id, {
+            "and": [
+                {"property": field_name, "date": {"on_or_after": first_day.isoformat()}},
+                {"property": field_name, "date": {"on_or_before": last_day.isoformat()}}
+            ]
+        }):
+            date = page["properties"][field_name]["date"]
+            day = date["start"][:10] if date else None
+            if day in pages_by_day:
+                pages_by_day[day].append(page)
+
+        for day, pages in pages_by_day.items():
+            self._database_query_cache.set(day_keys[day], pages or "No page returned!", database_id)
+        page_ids = {page["id"] for pages in pages_by_day.values() for page in pages}
+        self._database_query_cache.set(cache_key, pages_by_day, database_id, page_ids)
+        return pages_by_day
+
     def _get_database_pages_by_text_field(self, database_id: str, field_name: str, field_value: str) -> str | List[dict]:
         # Generate cache key
         cache_key = self._generate_cache_key("text", database_id, field_name, field_value)
 
         # Check cache first
-        if cache_key in self._database_query_cache:
-            return self._database_query_cache[cache_key]
+        cached = self._database_query_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         # If not in cache, make the API call
-        pages = "No page returned!"
-        query = self.client.databases.query(
-            database_id=database_id,
-            filter={
-                "and": [{
-                    "property": field_name,
-                    "rich_text": {"contains": field_value}
-                }]
-            }
-        )
-        if query['results']:
-            pages = query['results']
+        pages = self._query_database(database_id, {
+            "and": [{
+                "property": field_name,
+                "rich_text": {"contains": field_value}
+            }]
+        })
 
         # Store in cache
-        self._database_query_cache[cache_key] = pages
+        self._database_query_cache.set(cache_key, pages, database_id)
         return pages
 
-    def _get_database_pages_by_title(self, database_id: str, field_name: str, page_title: str) -> str | List[dict]:
+    def _get_database_pages_by_text_field_values(self, database_id: str, field_name: str, field_values: List[str],
+                                                 chunk_size: int = 50) -> Dict[str, List[dict]]:
+        """
+        Look up many exact rich_text values with one `or` filter per chunk instead of one query per value.
+
+        Returns a map of value -> matching pages; values with no page are left out.
+        """
+        unique_values = list(dict.fromkeys(value for value in field_values if value))
+        pages_by_value = {}
+        for start in range(0, len(unique_values), chunk_size):
+            chunk = unique_values[start:start + chunk_size]
+            pages = self._query_database_pages(database_id, {
+                "or": [{"property": field_name, "rich_text": {"equals": value}} for value in chunk]
+            })
+            for page in pages:
+                rich_text = page["properties"][field_name]["rich_text"]
+                page_value = "".join(part.get("plain_text", "") for part in rich_text)
+                # Only trust pages whose value matches one of the requested values exactly
+                if page_value in chunk:
+                    pages_by_value.setdefault(page_value, []).append(page)
+        return pages_by_value
+
+    def _get_database_pages_by_titles(self, database_id: str, field_name: str,
+                                      page_titles: List[str]) -> Dict[str, dict]:
+        """
+        Look up many pages by title with one `or` query instead of one query per title.
+
+        Each title is matched like _get_database_pages_by_title: a page whose title is exactly the
+        requested one is preferred, otherwise the first page whose title contains it is used. Only the
+        in-memory cache is used, so values derived from other pages (formulas, rollups) stay fresh
+        across runs.
+
+        Returns a map of requested title -> page; titles with no page are left out.
+        """
+        unique_titles = list(dict.fromkeys(title for title in page_titles if title))
+        if not unique_titles:
+            return {}
+        cache_key = self._generate_cache_key("titles", database_id, field_name, tuple(sorted(unique_titles)))
+        cached = self._database_query_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        pages = list(self._query_database_pages(database_id, {
+            "or": [{"property": field_name, "title": {"contains": title}} for title in unique_titles]
+        }))
+        index = NotionReferenceIndex(field_name, pages)
+        pages_by_title = {}
+        for title in unique_titles:
+            exact_matches = index.get(title)
+            if exact_matches:
+                pages_by_title[title] = exact_matches[0]
+                continue
+            for page in pages:
+                if title in index.title_of(page):
+                    pages_by_title[title] = page
+                    break
+
+        self._database_query_cache.set(cache_key, pages_by_title, database_id, [page["id"] for page in pages])
+        return pages_by_title
+
+    def _get_database_pages_by_title(self, database_id: str, field_name: str, page_title: str,
+                                     use_disk_cache: bool = True) -> str | List[dict]:
         # Generate cache key
         cache_key = self._generate_cache_key("title", database_id, field_name, page_title)
 
         # Check cache first
-        if cache_key in self._database_query_cache:
-            return self._database_query_cache[cache_key]
+        cached = self._database_query_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Then the disk cache for reference databases
+        use_disk_cache = use_disk_cache and self._is_disk_cached(database_id)
+        if use_disk_cache:
+            cached = self._disk_cache.get(database_id, cache_key)
+            if cached is not None:
+                self._database_query_cache.set(cache_key, cached, database_id)
+                return cached
 
         # If not in cache, make the API call
-        pages = "No page returned!"
-        query = self.client.databases.query(
-            database_id=database_id,
-            filter={
-                "and": [{
-                    "property": field_name,
-                    "title": {"contains": page_title}
-                }]
-            }
-        )
-        if query['results']:
-            pages = query['results']
+        pages = self._query_database(database_id, {
+            "and": [{
+                "property": field_name,
+                "title": {"contains": page_title}
+            }]
+        })
 
         # Store in cache
-        self._database_query_cache[cache_key] = pages
+        self._database_query_cache.set(cache_key, pages, database_id)
+        if use_disk_cache:
+            self._disk_cache.set(database_id, cache_key, pages)
         return pages
 
+    def _get_all_database_pages(self, database_id: str) -> List[dict]:
+        """Every page in a (small) database, read with one paged scan"""
+        cache_key, pages, use_disk_cache = self._get_cached_all_database_pages(database_id)
+        if pages is None:
+            pages = list(self._query_database_pages(database_id))
+            self._cache_all_database_pages(database_id, cache_key, pages, use_disk_cache)
+        return pages
+
+    def _get_cached_all_database_pages(self, database_id: str) -> Tuple[tuple, List[dict] | None, bool]:
+        """
+        For a full scan of the database: its cache key, the pages from the in-memory or disk cache (None
+        if neither has them) and whether the scan should be stored in the disk cache
+        """
+        cache_key = self._generate_cache_key("all", database_id)
+
+        # Check cache first
+        cached = self._database_query_cache.get(cache_key)
+        if cached is not None:
+            return cache_key, cached, False
+
+        # Then the disk cache for reference databases
+        use_disk_cache = self._is_disk_cached(database_id)
+        if use_disk_cache:
+            cached = self._disk_cache.get(database_id, cache_key)
+            if cached is not None:
+                self._database_query_cache.set(cache_key, cached, database_id)
+                return cache_key, cached, True
+        return cache_key, None, use_disk_cache
+
+    def _cache_all_database_pages(self, database_id: str, cache_key: tuple, pages: List[dict], use_disk_cache: bool):
+        self._database_query_cache.set(cache_key, pages, database_id)
+        if use_disk_cache:
+            self._disk_cache.set(database_id, cache_key, pages)
+
     def _get_block_children_by_id(self, block_id: str) -> List[dict]:
         # Generate cache key
         cache_key = self._generate_cache_key("block_children", block_id)
 
         # Check cache first
-        if cache_key in self._database_query_cache:
-            return self._database_query_cache[cache_key]
+        cached = self._database_query_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         # If not in cache, make the API call
         blocks = []
-        query = self.client.blocks.children.list(
-            block_id=block_id
-        )
+        query = self._request(self.client.blocks.children.list, block_id=block_id)
         for item in query["results"]:
             block = {"id": item["id"], "type": item["type"]}
             blocks.append(block)
@@ -201,20 +480,94 @@ class NotionBasic(NotionConfig):
 
     def _get_page_by_id(self, page_id: str) -> str | dict:
         # Check cache first
-        if page_id in self._page_cache:
-            return self._page_cache[page_id]
+        cache_key = NotionCache.normalize_id(page_id)
+        cached = self._page_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
         # If not in cache, make the API call
         page = "No page returned!"
-        query = self.client.pages.retrieve(page_id=page_id)
+        query = self._request(self.client.pages.retrieve, page_id=page_id)
         if query:
             page = query
             # Store in cache
-            self._page_cache[page_id] = page
+            self._cache_page(page)
         return page
 
+    def _prefetch_pages(self, page_ids_by_database: Dict[str, Iterable[str]]):
+        """
+        Fill the page cache with many pages before they are read one at a time.
+
+        IDs are deduplicated and grouped by the database they live in. Reference databases are read with
+        one (cached) scan of the whole database; every other page is retrieved concurrently.
+        """
+        to_retrieve = []
+        for database_id, page_ids in page_ids_by_database.items():
+            missing_ids = {NotionCache.normalize_id(page_id): page_id for page_id in page_ids
+                           if NotionCache.normalize_id(page_id) not in self._page_cache}
+            if not missing_ids:
+                continue
+            if database_id and self._is_reference_database(database_id):
+                for page in self._get_all_database_pages(database_id):
+                    if NotionCache.normalize_id(page["id"]) in missing_ids:
+                        self._cache_page(page)
+                        missing_ids.pop(NotionCache.normalize_id(page["id"]))
+            to_retrieve.extend(missing_ids.values())
+
+        if not to_retrieve:
+            return
+
+        def retrieve(page_id: str):
+            try:
+                return self._request(self.client.pages.retrieve, page_id=page_id)
+            except Exception as e:
+                # Leave it to the regular per-page lookup to retry or raise
+                print(f"Error prefetching page {page_id}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.PREFETCH_WORKERS) as executor:
+            for page in executor.map(retrieve, to_retrieve):
+                if page:
+                    self._cache_page(page)
+        print(f"Prefetched {len(to_retrieve)} related pages")
+
+    def _cache_page(self, page: dict):
+        database_id = page.get("parent", {}).get("database_id")
+        self._page_cache.set(NotionCache.normalize_id(page["id"]), page, database_id)
+
+    def _write_through(self, page_id: str, response: dict, database_id: str = None) -> dict:
+        """
+        Keep the caches consistent with a write: the page entry is replaced by the page the API returned
+        (or dropped if it was archived) and every query result from the page's database is evicted, since
+        the write may have moved the page in or out of any of them.
+        """
+        self._page_cache.invalidate_page(page_id)
+        self._database_query_cache.invalidate_page(page_id)
+
+        if isinstance(response, dict):
+            database_id = database_id or response.get("parent", {}).get("database_id")
+            if response.get("object") == "page" and not response.get("archived") and not response.get("in_trash"):
+                self._cache_page(response)
+        if database_id:
+            self._database_query_cache.invalidate_database(database_id)
+            if self._disk_cache is not None and self._is_reference_database(database_id):
+                self._disk_cache.invalidate_database(database_id)
+        return response
+
+    def _is_reference_database(self, database_id: str) -> bool:
+        normalized_id = NotionCache.normalize_id(database_id)
+        return any(NotionCache.normalize_id(reference_id) == normalized_id
+                   for reference_id in self.reference_database_ids if reference_id)
+
+    def cache_stats(self) -> dict:
+        return {"pages": self._page_cache.stats, "queries": self._database_query_cache.stats,
+                "requests": self._scheduler.stats, "coalesced_writes": self.coalesced_write_count,
+                "skipped_writes": self.skipped_write_count}
+
     def _delete_page_by_id(self, page_id: str):
-        return self.client.pages.update(page_id=page_id, archived=True)
+        response = self._request(
+            self.client.pages.update, NotionRequestScheduler.WRITE, page_id=page_id, archived=True)
+        return self._write_through(page_id, response)
 
     def _update_block_text(self, text: str, block_id: str, block_type: str):
         properties = {
@@ -227,25 +580,123 @@ class NotionBasic(NotionConfig):
             "block_id": block_id,
             block_type: properties
         }
-        return self.client.blocks.update(**update)
-
-    def _update_database_page(self, page_id: str, fields: dict):
+        return self._request(self.client.blocks.update, NotionRequestScheduler.WRITE, **update)
+
+    @contextmanager
+    def _coalesced_writes(self):
+        """
+        Hold back page updates made inside the block and send one PATCH per page when the outermost block
+        exits, with every property (and the icon) set on that page merged together. Later values for the
+        same property win.
+
+        Until then, the update calls return a stand-in page with the merged properties, and reads inside
+        the block don't see the buffered changes. Pages created inside the block are still created
+        immediately.
+        """
+        self._write_buffer_depth += 1
+        if self._write_buffer is None:
+            self._write_buffer = {}
+        try:
+            yield
+        finally:
+            self._write_buffer_depth -= 1
+            if self._write_buffer_depth == 0:
+                self._flush_writes()
+
+    def _buffer_write(self, page_id: str, properties: dict = None, icon: dict = None,
+                      skip_unchanged: bool = False) -> dict:
+        update = self._write_buffer.get(NotionCache.normalize_id(page_id))
+        if update is None:
+            update = self._write_buffer[NotionCache.normalize_id(page_id)] = {"page_id": page_id}
+        else:
+            self.coalesced_write_count += 1
+        if properties:
+            update.setdefault("properties", {}).update(properties)
+            skippable = update.setdefault("skip_unchanged", set())
+            if skip_unchanged:
+                skippable.update(properties)
+            else:
+                skippable.difference_update(properties)
+        if icon:
+            update["icon"] = icon
+        return {"object": "page", "id": page_id, "properties": dict(update.get("properties", {}))}
+
+    def _take_buffered_writes(self) -> List[dict]:
+        updates = list(self._write_buffer.values()) if self._write_buffer else []
+        self._write_buffer = None
+        return updates
+
+    def _flush_writes(self) -> List[dict]:
+        return [self._send_page_update(update) for update in self._take_buffered_writes()]
+
+    def _prepare_page_update(self, update: dict) -> dict | None:
+        """
+        pages.update arguments for a pending update, without the skippable properties whose fingerprint
+        shows they already hold the value being written; None if that leaves nothing to send
+        """
+        properties = update.get("properties") or {}
+        skippable = {name: properties[name] for name in update.get("skip_unchanged", ()) if name in properties}
+        unchanged = self._write_fingerprints.unchanged(update["page_id"], skippable)
+        properties = {name: value for name, value in properties.items() if name not in unchanged}
+
+        if not properties and not update.get("icon"):
+            self.skipped_write_count += 1
+            return None
+        request = {"page_id": update["page_id"]}
+        if properties:
+            request["properties"] = properties
+        if update.get("icon"):
+            request["icon"] = update["icon"]
+        return request
+
+    def _finish_page_update(self, update: dict, request: dict, response: dict) -> dict:
+        skippable = update.get("skip_unchanged", ())
+        written = request.get("properties", {})
+        self._write_fingerprints.record(
+            update["page_id"], {name: value for name, value in written.items() if name in skippable})
+        # Anything else written to the page may have changed a fingerprinted property behind its back
+        self._write_fingerprints.forget(update["page_id"], [name for name in written if name not in skippable])
+        return self._write_through(update["page_id"], response)
+
+    def _skipped_page_update(self, page_id: str) -> dict:
+        return self._page_cache.get(NotionCache.normalize_id(page_id)) or {"object": "page", "id": page_id}
+
+    def _send_page_update(self, update: dict) -> dict:
+        request = self._prepare_page_update(update)
+        if request is None:
+            return self._skipped_page_update(update["page_id"])
+        response = self._request(self.client.pages.update, NotionRequestScheduler.WRITE, **request)
+        return self._finish_page_update(update, request, response)
+
+    def _update_database_page(self, page_id: str, fields: dict, skip_unchanged: bool = False):
+        """
+        Args:
+            skip_unchanged: Leave out properties this code last set to the same values (see
+                NotionWriteFingerprints). Only for pages nobody else edits, such as the tracking pages
+                the Garmin pipelines fill in.
+        """
+        if self._write_buffer is not None:
+            return self._buffer_write(page_id, properties=fields, skip_unchanged=skip_unchanged)
         update = {
             "page_id": page_id,
-            "properties": fields
+            "properties": fields,
+            "skip_unchanged": set(fields) if skip_unchanged else set()
         }
-        return self.client.pages.update(**update)
+        return self._send_page_update(update)
 
     def _update_page_icon(self, page_id: str, icon: dict):
+        if self._write_buffer is not None:
+            return self._buffer_write(page_id, icon=icon)
         update = {
             "page_id": page_id,
             "icon": icon
             }
-        return self.client.pages.update(**update)
+        return self._send_page_update(update)
 
     def _post_new_database_page(self, database_id: str, properties: dict) -> dict:
         page = {
             "parent": {"database_id": database_id},
             "properties": properties,
         }
-        return self.client.pages.create(**page)
+        response = self._request(self.client.pages.create, NotionRequestScheduler.WRITE, **page)
+        return self._write_through(response["id"], response, database_id)
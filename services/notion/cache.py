@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable
+import json
+import time
+
+
+class NotionCache:
+    """
+    Bounded LRU cache with per-database TTLs for Notion pages and query results.
+
+    Every entry remembers the database it came from and the ids of the pages it holds, so writes can
+    evict exactly the entries they make stale instead of leaving pre-write data behind.
+    """
+
+    def __init__(self, default_ttl: float = 300, ttl_by_database: Dict[str, float] = None,
+                 max_entries: int = 1000, max_size: int = 5_000_000):
+        self.default_ttl = default_ttl
+        self.ttl_by_database = {self.normalize_id(key): value for key, value in (ttl_by_database or {}).items()}
+        self.max_entries = max_entries
+        self.max_size = max_size  # Approximate size of all cached values, in characters of JSON
+
+        # key -> (value, expires_at, database_id, page_ids, size), oldest use first
+        self._entries: OrderedDict = OrderedDict()
+        self._size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize_id(notion_id: str | None) -> str | None:
+        """Notion returns hyphenated UUIDs while the .env ids are usually bare, so compare them without hyphens"""
+        if not notion_id:
+            return None
+        return notion_id.replace("-", "").lower()
+
+    @staticmethod
+    def page_ids_in(value: Any) -> set:
+        """Collect the ids of the Notion pages contained in a cached value"""
+        if isinstance(value, dict) and value.get("object") == "page":
+            return {NotionCache.normalize_id(value.get("id"))}
+        if isinstance(value, list):
+            return {NotionCache.normalize_id(item.get("id")) for item in value
+                    if isinstance(item, dict) and item.get("id")}
+        return set()
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        if entry[1] <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, database_id: str = None, page_ids: Iterable[str] = None):
+        # Drop the old value first, so it isn't served on if the new one can't be cached
+        if key in self._entries:
+            self._remove(key)
+
+        database_id = self.normalize_id(database_id)
+        ttl = self.ttl_by_database.get(database_id, self.default_ttl)
+        if ttl <= 0:
+            return
+
+        if page_ids is None:
+            page_ids = self.page_ids_in(value)
+        size = len(json.dumps(value, default=str))
+        if size > self.max_size:
+            return
+
+        self._entries[key] = (value, time.monotonic() + ttl, database_id, frozenset(page_ids), size)
+        self._size += size
+
+        while len(self._entries) > self.max_entries or self._size > self.max_size:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        if key in self._entries:
+            self._remove(key)
+
+    def invalidate_page(self, page_id: str):
+        """Evict every entry that contains the given page"""
+        page_id = self.normalize_id(page_id)
+        stale_keys = [key for key, entry in self._entries.items() if page_id in entry[3]]
+        for key in stale_keys:
+            self._remove(key)
+
+    def invalidate_database(self, database_id: str):
+        """Evict every entry that was read from the given database"""
+        database_id = self.normalize_id(database_id)
+        stale_keys = [key for key, entry in self._entries.items() if entry[2] == database_id]
+        for key in stale_keys:
+            self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "size": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._size -= entry[4]
@@ -36,3 +36,11 @@ class NotionConfig:
 
         self.insight_block_id = os.getenv("NOTION_INSIGHT_BLOCK_ID")
 
+        # Small, slowly changing databases that tasks and projects relate to
+        self.reference_database_ids = [
+            self.pillar_database_id, self.value_goal_database_id, self.goal_outcome_database_id,
+            self.week_database_id, self.month_database_id, self.quarter_database_id, self.tracker_database_id
+        ]
+        # Optional SQLite file that keeps reference-database lookups between pipeline runs
+        self.disk_cache_path = os.getenv("NOTION_DISK_CACHE_PATH")
+
@@ -7,8 +7,9 @@ from data_models.subtask import Subtask
 from data_models.task import Task
 from data_models.timecube import Timecube
 from services.notion.database_fields import NotionDatabaseFields
+from services.notion.reference_index import NotionReferenceIndex
 
-from typing import List
+from typing import Dict, List
 """
 GET/POST/PATCH methods for specific databases
 """
@@ -18,44 +19,89 @@ class NotionDatabaseSpecific(NotionDatabaseFields):
     """
     GET/POST/PATCH specific database pages
     """
+    # Trackers returned by get_tracker_data, in order
+    TRACKER_TITLES = ("Weight", "Body Fat", "HEAT Loan", "Credit Card", "Federal Student Loan",
+                      "Primary Mortgage", "Secondary Mortgage")
+
+    def __init__(self):
+        super().__init__()
+        self._reference_indexes: Dict[str, NotionReferenceIndex] = {}  # Exact-match title indexes by database ID
+
+    def _get_reference_index(self, database_id: str, title_field: str) -> NotionReferenceIndex:
+        """Load a small database once and index its pages by normalized title"""
+        if database_id not in self._reference_indexes:
+            self._index_reference_pages(database_id, title_field, self._get_all_database_pages(database_id))
+        return self._reference_indexes[database_id]
+
+    def _index_reference_pages(self, database_id: str, title_field: str, pages: List[dict]) -> NotionReferenceIndex:
+        self._reference_indexes[database_id] = NotionReferenceIndex(title_field, pages)
+        print(f"Indexed {len(pages)} pages from database {database_id}")
+        return self._reference_indexes[database_id]
+
+    def _get_reference_pages_by_title(self, database_id: str, title_field: str, title: str) -> str | List[dict]:
+        return self._reference_pages_matching(self._get_reference_index(database_id, title_field), title)
+
+    @staticmethod
+    def _reference_pages_matching(index: NotionReferenceIndex, title: str) -> str | List[dict]:
+        pages = index.get(title)
+        if not pages:
+            return "No page returned!"
+        return pages
+
+    def _post_new_reference_page(self, database_id: str, properties: dict) -> dict:
+        """Create a page in an indexed database and add it to the index"""
+        page = self._post_new_database_page(database_id, properties)
+        if database_id in self._reference_indexes:
+            self._reference_indexes[database_id].add(page)
+        return page
+
     def _get_pillar_pages_by_title(self, pillar: str) -> str | List[dict]:
-        return self._get_database_pages_by_title(self.pillar_database_id, "Pillar", pillar)
+        return self._get_reference_pages_by_title(self.pillar_database_id, "Pillar", pillar)
 
     def _get_value_goal_pages_by_title(self, value_goal: str) -> str | List[dict]:
-        return self._get_database_pages_by_title(self.value_goal_database_id, "Name", value_goal)
+        return self._get_reference_pages_by_title(self.value_goal_database_id, "Name", value_goal)
 
     def _get_goal_outcome_page_by_id(self, goal_id: str) -> str | dict:
         return self._get_page_by_id(goal_id)
 
     def _get_goal_outcome_pages_by_title(self, goal: str) -> str | List[dict]:
-        return self._get_database_pages_by_title(self.goal_outcome_database_id, "Name", goal)
+        return self._get_reference_pages_by_title(self.goal_outcome_database_id, "Name", goal)
 
     def _get_project_pages_by_title(self, project: str) -> str | List[dict]:
-        return self._get_database_pages_by_title(self.project_database_id, "Project Name", project)
+        return self._get_reference_pages_by_title(self.project_database_id, "Project Name", project)
 
     def _get_task_pages_by_am_id(self, am_id: str) -> str | List[dict]:
         return self._get_database_pages_by_text_field(self.tasks_database_id, "AM ID", am_id)
 
+    def _get_task_pages_by_am_ids(self, am_ids: List[str]) -> Dict[str, List[dict]]:
+        return self._get_database_pages_by_text_field_values(self.tasks_database_id, "AM ID", am_ids)
+
     def _get_task_pages_by_delete_checkbox(self) -> str | List[dict]:
         return self._get_database_pages_by_checkbox_field(self.tasks_database_id, "Delete", True)
 
     def _get_task_pages_by_scheduled_date(self, date: Timecube) -> str | List[dict]:
         return self._get_database_pages_by_date_field(self.tasks_database_id, "Scheduled", date)
 
+    def _get_task_pages_by_scheduled_date_range(self, start_date: Timecube, end_date: Timecube) -> Dict[str, List[dict]]:
+        return self._get_database_pages_by_date_range(self.tasks_database_id, "Scheduled", start_date, end_date)
+
     def _get_task_pages_by_title(self, task: str) -> str | List[dict]:
         return self._get_database_pages_by_title(self.tasks_database_id, "Task", task)
 
-    def _get_task_pages_by_last_edited(self, minutes_in_the_past: int) -> str | List[dict]:
+    def _get_task_pages_by_last_edited(self, minutes_in_the_past: int = 60) -> List[dict]:
         return self._get_database_pages_by_last_edited(self.tasks_database_id, minutes_in_the_past)
 
+    def _commit_task_pages_watermark(self):
+        self._commit_database_watermark(self.tasks_database_id)
+
     def _get_quarter_pages_by_title(self, quarter: str) -> str | List[dict]:
-        return self._get_database_pages_by_title(self.quarter_database_id, "Quarter", quarter)
+        return self._get_reference_pages_by_title(self.quarter_database_id, "Quarter", quarter)
 
     def _get_month_pages_by_title(self, month: str) -> str | List[dict]:
-        return self._get_database_pages_by_title(self.month_database_id, "Name", month)
+        return self._get_reference_pages_by_title(self.month_database_id, "Name", month)
 
     def _get_week_pages_by_title(self, week: str) -> str | List[dict]:
-        return self._get_database_pages_by_title(self.week_database_id, "Name", week)
+        return self._get_reference_pages_by_title(self.week_database_id, "Name", week)
 
     def _get_daily_tracking_pages_by_date(self, date: Timecube) -> str | List[dict]:
         return self._get_database_pages_by_date_field(self.daily_tracking_database_id, "Date", date)
@@ -76,16 +122,22 @@ class NotionDatabaseSpecific(NotionDatabaseFields):
         return self._get_database_pages_by_date_field(self.steps_database_id, "Date", page_date)
 
     def _get_tracker_pages_by_title(self, tracker: str) -> str | List[dict]:
-        return self._get_database_pages_by_title(self.tracker_database_id, "Name", tracker)
+        return self._get_reference_pages_by_title(self.tracker_database_id, "Name", tracker)
+
+    def _get_tracker_pages_by_titles(self, tracker_titles: List[str]) -> Dict[str, dict]:
+        return self._get_database_pages_by_titles(self.tracker_database_id, "Name", tracker_titles)
+
+    def _get_tracker_values_most_recent(self, tracker_titles: List[str]) -> Dict[str, float | None]:
+        # "Current Value" is a formula over tracker entries, which changes without touching the tracker
+        # page's last_edited_time, so these reads skip the disk cache
+        tracker_pages = self._get_tracker_pages_by_titles(tracker_titles)
+        return {title: page["properties"]["Current Value"]["formula"]["number"]
+                for title, page in tracker_pages.items()}
 
     def _get_tracker_data_most_recent(self):
-        weight = self._get_database_pages_by_title(self.tracker_database_id, "Name", "Weight")[0]["properties"]["Current Value"]["formula"]["number"]
-        bodyfat = self._get_database_pages_by_title(self.tracker_database_id, "Name", "Body Fat")[0]["properties"]["Current Value"]["formula"]["number"]
-        heat_loan = self._get_database_pages_by_title(self.tracker_database_id, "Name", "HEAT Loan")[0]["properties"]["Current Value"]["formula"]["number"]
-        credit_card = self._get_database_pages_by_title(self.tracker_database_id, "Name", "Credit Card")[0]["properties"]["Current Value"]["formula"]["number"]
-        fed_student = self._get_database_pages_by_title(self.tracker_database_id, "Name", "Federal Student Loan")[0]["properties"]["Current Value"]["formula"]["number"]
-        prim_mort = self._get_database_pages_by_title(self.tracker_database_id, "Name", "Primary Mortgage")[0]["properties"]["Current Value"]["formula"]["number"]
-        sec_mort = self._get_database_pages_by_title(self.tracker_database_id, "Name", "Secondary Mortgage")[0]["properties"]["Current Value"]["formula"]["number"]
+        values = self._get_tracker_values_most_recent(self.TRACKER_TITLES)
+        weight, bodyfat, heat_loan, credit_card, fed_student, prim_mort, sec_mort = (
+            values[title] for title in self.TRACKER_TITLES)
 
         weight = round(float(weight), 2)
         bodyfat = round(float(bodyfat), 2)
@@ -110,7 +162,7 @@ class NotionDatabaseSpecific(NotionDatabaseFields):
                 "title": [{"text": {"content": week}}]
             }
         }
-        return self._post_new_database_page(self.week_database_id, properties)
+        return self._post_new_reference_page(self.week_database_id, properties)
 
     def _post_new_month(self, month: str) -> dict:
         properties = {
@@ -118,7 +170,7 @@ class NotionDatabaseSpecific(NotionDatabaseFields):
                 "title": [{"text": {"content": month}}]
             }
         }
-        return self._post_new_database_page(self.month_database_id, properties)
+        return self._post_new_reference_page(self.month_database_id, properties)
 
     def _post_new_quarter(self, quarter: str) -> dict:
         properties = {
@@ -126,7 +178,7 @@ class NotionDatabaseSpecific(NotionDatabaseFields):
                 "title": [{"text": {"content": quarter}}]
             }
         }
-        return self._post_new_database_page(self.quarter_database_id, properties)
+        return self._post_new_reference_page(self.quarter_database_id, properties)
 
     def _post_new_project(self, project: Project) -> dict:
         pillar_id = self._get_pillar_pages_by_title(project.pillar)[0]["id"]
@@ -184,59 +236,19 @@ class NotionDatabaseSpecific(NotionDatabaseFields):
                 "relation": [{"id": quarter_id}]
             }
 
-        return self._post_new_database_page(self.project_database_id, properties)
+        return self._post_new_reference_page(self.project_database_id, properties)
 
     def _post_new_sleep(self, sleep: Sleep, skip_zero_sleep=True) -> dict | str:
         """Creates a page in the Sleep Database. Returns the new page id"""
         if skip_zero_sleep and sleep.total_sleep == 0:
             return f"Skipping sleep data for {sleep.start_time.date_Y_m_d} as total sleep is 0"
 
-        properties = {
-            "Date": {
-                "title": [{"text": {"content": "Sleep " + sleep.start_time.date_for_titles}}]
-            },
-            "Times": {
-                "rich_text": [
-                    {"text": {
-                        "content": f"{sleep.start_time.clock_time_H_M} → {sleep.end_time.clock_time_H_M}"}}]},
-            "Long Date": {"date": {"start": sleep.start_time.date_time_Y_m_d_H_M_S}},
-            "Full Date/Time": {"date": {"start": sleep.start_time.date_time_Y_m_d_H_M_S,
-                                        "end": sleep.end_time.date_time_Y_m_d_H_M_S}},
-            "Total Sleep (h)": {"number": sleep.total_sleep},
-            "Light Sleep (h)": {"number": sleep.light_sleep},
-            "Deep Sleep (h)": {"number": sleep.deep_sleep},
-            "REM Sleep (h)": {"number": sleep.rem_sleep},
-            "Awake Time (h)": {"number": sleep.awake_time},
-            "Total Sleep": {
-                "rich_text": [{"text": {"content": Sleep.format_hours_to_hm(sleep.total_sleep)}}]},
-            "Light Sleep": {
-                "rich_text": [{"text": {"content": Sleep.format_hours_to_hm(sleep.light_sleep)}}]},
-            "Deep Sleep": {
-                "rich_text": [{"text": {"content": Sleep.format_hours_to_hm(sleep.deep_sleep)}}]},
-            "REM Sleep": {
-                "rich_text": [{"text": {"content": Sleep.format_hours_to_hm(sleep.rem_sleep)}}]},
-            "Awake Time": {
-                "rich_text": [{"text": {"content": Sleep.format_hours_to_hm(sleep.awake_time)}}]},
-            "Resting HR": {"number": sleep.resting_hr if hasattr(sleep, 'resting_hr') else 0}
-        }
+        properties = self._create_sleep_properties(sleep)
         return self._post_new_database_page(self.sleep_database_id, properties)
 
     def _post_new_steps(self, entry_date: Timecube, steps: int, total_distance: int):
         """Add a new page to the Step Database with the day's steps. Returns the id of the created page"""
-        properties_payload = {
-            "Activity": {
-                "title": [{"text": {"content": "Walking - " + entry_date.date_for_titles}}]
-            },
-            "Date": {
-                "date": {"start": entry_date.date_Y_m_d}
-            },
-            "Total Steps": {
-                "number": steps
-            },
-            "Total Distance (miles)": {
-                "number": total_distance
-            }
-        }
+        properties_payload = self._create_steps_properties(entry_date, steps, total_distance)
         return self._post_new_database_page(self.steps_database_id, properties_payload)
 
     def _post_new_subtask(self, subtask: Subtask) -> dict:
@@ -325,81 +337,32 @@ class NotionDatabaseSpecific(NotionDatabaseFields):
 
     def _post_new_body_fat_tracker_entry(self, timecube: Timecube, body_fat: float) -> dict:
         tracker_id = self._get_tracker_pages_by_title("Body Fat")[0]["id"]
-        properties = {
-            "Tracker Entry": {
-                "title": [{"text": {"content": "Body Fat Log - " + timecube.date_for_titles}}]
-            },
-            "Date": {
-                "date": {"start": timecube.date_Y_m_d}
-            },
-            "Value": {
-                "number": body_fat
-            },
-            "Unit": {
-                "rich_text": [{"text": {"content": "percent"}}]
-            },
-            "Tracker": {
-                "relation": [{"id": tracker_id}]
-            }
-        }
+        properties = self._create_tracker_entry_properties(tracker_id, "Body Fat Log", timecube, body_fat, "percent")
         return self._post_new_database_page(self.tracker_entry_database_id, properties)
 
     def _post_new_weight_tracker_entry(self, timecube: Timecube, weight: float) -> dict:
         tracker_id = self._get_tracker_pages_by_title("Weight")[0]["id"]
-        properties = {
-            "Tracker Entry": {
-                "title": [{"text": {"content": "Weight Log - " + timecube.date_for_titles}}]
-            },
-            "Date": {
-                "date": {"start": timecube.date_Y_m_d}
-            },
-            "Value": {
-                "number": weight
-            },
-            "Unit": {
-                "rich_text": [{"text": {"content": "percent"}}]
-            },
-            "Tracker": {
-                "relation": [{"id": tracker_id}]
-            }
-        }
+        properties = self._create_tracker_entry_properties(tracker_id, "Weight Log", timecube, weight, "percent")
         response = self._post_new_database_page(self.tracker_entry_database_id, properties)
         return response
 
     def _post_new_training_page(self, timecube: Timecube, training_status: str, readiness_description: str,
                                 training_readiness: int, daily_average_stress: int):
-        properties = {
-            "Training Log": {
-                "title": [{"text": {"content": "Training Log - " + timecube.date_for_titles}}]
-            },
-            "Today's Date": {
-                "date": {"start": timecube.date_Y_m_d}
-            },
-            "Training Status": {
-                "rich_text": [{"text": {"content": training_status}}]
-            },
-            "Average Stress": {
-                "number": daily_average_stress
-            },
-            "Readiness Score": {
-                "number": training_readiness
-            },
-            "Readiness Description": {
-                "rich_text": [{"text": {"content": readiness_description}}]
-            },
-        }
+        properties = self._create_training_properties(
+            timecube, training_status, readiness_description, training_readiness, daily_average_stress)
         return self._post_new_database_page(self.stats_database_id, properties)
 
     def _update_activity_page(self, activity: Activity, activity_page_id: str):
         properties = self._create_activity_properties(activity)
         return self._update_database_page(activity_page_id, properties)
 
-    def _update_daily_tracking_page(self, timecube: Timecube, field: str, field_type: str, value: str | int):
+    def _update_daily_tracking_page(self, timecube: Timecube, field: str, field_type: str, value: str | int,
+                                    skip_unchanged: bool = False):
         page_id = self._get_daily_tracking_pages_by_date(timecube)[0]["id"]
         properties = {
             field: {field_type: value}
         }
-        return self._update_database_page(page_id, properties)
+        return self._update_database_page(page_id, properties, skip_unchanged=skip_unchanged)
 
     def _update_steps_page_with_steps(self, timecube: Timecube, steps: int, total_distance: int):
         page_id = self._get_steps_pages_by_date(timecube)[0]["id"]
@@ -411,7 +374,7 @@ class NotionDatabaseSpecific(NotionDatabaseFields):
                 "number": total_distance
             }
         }
-        return self._update_database_page(page_id, properties)
+        return self._update_database_page(page_id, properties, skip_unchanged=True)
 
     def _update_task(self, task: Task):
         """
@@ -467,7 +430,7 @@ class NotionDatabaseSpecific(NotionDatabaseFields):
             "Readiness Description": {"rich_text": [{"text": {"content": readiness_description}}]},
             "Average Stress": {"number": daily_average_stress}
         }
-        return self._update_database_page(page_id, properties)
+        return self._update_database_page(page_id, properties, skip_unchanged=True)
 
     def _add_dependency_to_project(self, project_id: str, dependency_title: str):
         dependency_id = self._get_project_pages_by_title(dependency_title)[0]["id"]
@@ -521,6 +484,103 @@ class NotionDatabaseSpecific(NotionDatabaseFields):
         }
         return properties
 
+    @staticmethod
+    def _create_sleep_properties(sleep: Sleep) -> dict:
+        properties = {
+            "Date": {
+                "title": [{"text": {"content": "Sleep " + sleep.start_time.date_for_titles}}]
+            },
+            "Times": {
+                "rich_text": [
+                    {"text": {
+                        "content": f"{sleep.start_time.clock_time_H_M} → {sleep.end_time.clock_time_H_M}"}}]},
+            "Long Date": {"date": {"start": sleep.start_time.date_time_Y_m_d_H_M_S}},
+            "Full Date/Time": {"date": {"start": sleep.start_time.date_time_Y_m_d_H_M_S,
+                                        "end": sleep.end_time.date_time_Y_m_d_H_M_S}},
+            "Total Sleep (h)": {"number": sleep.total_sleep},
+            "Light Sleep (h)": {"number": sleep.light_sleep},
+            "Deep Sleep (h)": {"number": sleep.deep_sleep},
+            "REM Sleep (h)": {"number": sleep.rem_sleep},
+            "Awake Time (h)": {"number": sleep.awake_time},
+            "Total Sleep": {
+                "rich_text": [{"text": {"content": Sleep.format_hours_to_hm(sleep.total_sleep)}}]},
+            "Light Sleep": {
+                "rich_text": [{"text": {"content": Sleep.format_hours_to_hm(sleep.light_sleep)}}]},
+            "Deep Sleep": {
+                "rich_text": [{"text": {"content": Sleep.format_hours_to_hm(sleep.deep_sleep)}}]},
+            "REM Sleep": {
+                "rich_text": [{"text": {"content": Sleep.format_hours_to_hm(sleep.rem_sleep)}}]},
+            "Awake Time": {
+                "rich_text": [{"text": {"content": Sleep.format_hours_to_hm(sleep.awake_time)}}]},
+            "Resting HR": {"number": sleep.resting_hr if hasattr(sleep, 'resting_hr') else 0}
+        }
+        return properties
+
+    @staticmethod
+    def _create_steps_properties(entry_date: Timecube, steps: int, total_distance: int) -> dict:
+        properties = {
+            "Activity": {
+                "title": [{"text": {"content": "Walking - " + entry_date.date_for_titles}}]
+            },
+            "Date": {
+                "date": {"start": entry_date.date_Y_m_d}
+            },
+            "Total Steps": {
+                "number": steps
+            },
+            "Total Distance (miles)": {
+                "number": total_distance
+            }
+        }
+        return properties
+
+    @staticmethod
+    def _create_tracker_entry_properties(tracker_id: str, entry_name: str, timecube: Timecube, value: float,
+                                         unit: str) -> dict:
+        properties = {
+            "Tracker Entry": {
+                "title": [{"text": {"content": entry_name + " - " + timecube.date_for_titles}}]
+            },
+            "Date": {
+                "date": {"start": timecube.date_Y_m_d}
+            },
+            "Value": {
+                "number": value
+            },
+            "Unit": {
+                "rich_text": [{"text": {"content": unit}}]
+            },
+            "Tracker": {
+                "relation": [{"id": tracker_id}]
+            }
+        }
+        return properties
+
+    @staticmethod
+    def _create_training_properties(timecube: Timecube, training_status: str, readiness_description: str,
+                                    training_readiness: int, daily_average_stress: int) -> dict:
+        properties = {
+            "Training Log": {
+                "title": [{"text": {"content": "Training Log - " + timecube.date_for_titles}}]
+            },
+            "Today's Date": {
+                "date": {"start": timecube.date_Y_m_d}
+            },
+            "Training Status": {
+                "rich_text": [{"text": {"content": training_status}}]
+            },
+            "Average Stress": {
+                "number": daily_average_stress
+            },
+            "Readiness Score": {
+                "number": training_readiness
+            },
+            "Readiness Description": {
+                "rich_text": [{"text": {"content": readiness_description}}]
+            },
+        }
+        return properties
+
     def _create_time_cycle_properties(self, task, properties):
             today = Timecube.from_datetime(datetime.today())
             is_today = task.day.date_in_datetime.date() == today.date_in_datetime.date()
@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Tuple
+import json
+import os
+import sqlite3
+import time
+
+
+class NotionDiskCache:
+    """
+    SQLite-backed cache for Notion reference databases, shared by every pipeline run on the machine.
+
+    It also keeps the write fingerprints NotionWriteFingerprints uses to skip rewriting unchanged values.
+
+    Entries are grouped by database. Before a database's entries are trusted in a run, the caller asks
+    Notion whether any page in it was edited since the database was last validated (see
+    edited_since/mark_validated); if one was, every entry for that database is dropped. WAL mode and
+    a busy timeout let overlapping runs read and write the same file safely.
+    """
+    SCHEMA_VERSION = 2
+    # Archived pages don't show up in a last_edited_time query, so entries are never trusted past this age
+    MAX_ENTRY_AGE = timedelta(days=1)
+    # Notion rounds last_edited_time down to the minute, so look back a little further than the watermark
+    EDIT_TIME_SLACK = timedelta(minutes=2)
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._transaction() as cursor:
+            cursor.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = cursor.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if row is None or int(row[0]) != self.SCHEMA_VERSION:
+                cursor.execute("DROP TABLE IF EXISTS entries")
+                cursor.execute("DROP TABLE IF EXISTS databases")
+                cursor.execute("DROP TABLE IF EXISTS fingerprints")
+                cursor.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+                               (str(self.SCHEMA_VERSION),))
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    database_id TEXT NOT NULL,
+                    cache_key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 1,
+                    max_last_edited TEXT,
+                    stored_at REAL NOT NULL,
+                    PRIMARY KEY (database_id, cache_key)
+                )""")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS databases (
+                    database_id TEXT PRIMARY KEY,
+                    validated_at TEXT NOT NULL
+                )""")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    page_id TEXT NOT NULL,
+                    property TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    recorded_at REAL NOT NULL,
+                    PRIMARY KEY (page_id, property)
+                )""")
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._connection)
+
+    @staticmethod
+    def _normalize_id(database_id: str) -> str:
+        return database_id.replace("-", "").lower()
+
+    @staticmethod
+    def _serialize_key(cache_key: tuple) -> str:
+        return json.dumps(list(cache_key), default=str)
+
+    def get(self, database_id: str, cache_key: tuple) -> Any:
+        """Return the cached value, or None if it is missing or too old to trust"""
+        row = self._connection.execute(
+            "SELECT value, stored_at FROM entries WHERE database_id = ? AND cache_key = ?",
+            (self._normalize_id(database_id), self._serialize_key(cache_key))
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.MAX_ENTRY_AGE.total_seconds():
+            return None
+        return json.loads(row[0])
+
+    def set(self, database_id: str, cache_key: tuple, value: Any):
+        max_last_edited = None
+        if isinstance(value, list):
+            edited_times = [page.get("last_edited_time") for page in value
+                            if isinstance(page, dict) and page.get("last_edited_time")]
+            max_last_edited = max(edited_times) if edited_times else None
+        with self._transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO entries (database_id, cache_key, value, version, max_last_edited, stored_at)
+                VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT (database_id, cache_key) DO UPDATE SET
+                    value = excluded.value,
+                    version = entries.version + 1,
+                    max_last_edited = excluded.max_last_edited,
+                    stored_at = excluded.stored_at""",
+                (self._normalize_id(database_id), self._serialize_key(cache_key),
+                 json.dumps(value, default=str), max_last_edited, time.time()))
+
+    def invalidate_database(self, database_id: str):
+        with self._transaction() as cursor:
+            cursor.execute("DELETE FROM entries WHERE database_id = ?", (self._normalize_id(database_id),))
+
+    def edited_since(self, database_id: str) -> str | None:
+        """
+        The last_edited_time to revalidate the database's entries from, or None when there is nothing
+        cached to revalidate
+        """
+        database_id = self._normalize_id(database_id)
+        has_entries = self._connection.execute(
+            "SELECT 1 FROM entries WHERE database_id = ? LIMIT 1", (database_id,)).fetchone()
+        if not has_entries:
+            return None
+        row = self._connection.execute(
+            "SELECT validated_at FROM databases WHERE database_id = ?", (database_id,)).fetchone()
+        if row is None:
+            # Entries without a validation time can't be revalidated safely
+            self.invalidate_database(database_id)
+            return None
+        validated_at = datetime.fromisoformat(row[0]) - self.EDIT_TIME_SLACK
+        return validated_at.isoformat(timespec="seconds")
+
+    def mark_validated(self, database_id: str, validated_at: datetime = None):
+        validated_at = validated_at or datetime.now(timezone.utc)
+        with self._transaction() as cursor:
+            cursor.execute("INSERT OR REPLACE INTO databases (database_id, validated_at) VALUES (?, ?)",
+                           (self._normalize_id(database_id), validated_at.isoformat(timespec="seconds")))
+
+    def get_fingerprints(self, page_id: str) -> Dict[str, Tuple[str, float]]:
+        rows = self._connection.execute(
+            "SELECT property, hash, recorded_at FROM fingerprints WHERE page_id = ?",
+            (self._normalize_id(page_id),)).fetchall()
+        return {name: (fingerprint, recorded_at) for name, fingerprint, recorded_at in rows}
+
+    def set_fingerprints(self, page_id: str, fingerprints: Dict[str, Tuple[str, float]]):
+        page_id = self._normalize_id(page_id)
+        with self._transaction() as cursor:
+            cursor.executemany(
+                "INSERT OR REPLACE INTO fingerprints (page_id, property, hash, recorded_at) VALUES (?, ?, ?, ?)",
+                [(page_id, name, fingerprint, recorded_at)
+                 for name, (fingerprint, recorded_at) in fingerprints.items()])
+
+    def delete_fingerprints(self, page_id: str, property_names: Iterable[str]):
+        page_id = self._normalize_id(page_id)
+        with self._transaction() as cursor:
+            cursor.executemany("DELETE FROM fingerprints WHERE page_id = ? AND property = ?",
+                               [(page_id, name) for name in property_names])
+
+    def close(self):
+        self._connection.close()
+
+
+class _ImmediateTransaction:
+    """Takes the write lock up front so overlapping runs queue instead of failing mid-transaction"""
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+
+    def __enter__(self) -> sqlite3.Cursor:
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection.cursor()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.execute("COMMIT")
+        else:
+            self.connection.execute("ROLLBACK")
+        return False
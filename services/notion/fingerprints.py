@@ -0,0 +1,64 @@
+from services.notion.cache import NotionCache
+from services.notion.disk_cache import NotionDiskCache
+
+from datetime import timedelta
+from typing import Dict, Iterable, Set, Tuple
+import hashlib
+import json
+import time
+
+
+class NotionWriteFingerprints:
+    """
+    Remembers a hash of the last value written to each (page, property), so a write that would set a
+    property to the value it already has can be dropped.
+
+    Fingerprints are kept in the disk cache when one is configured, so they carry over between pipeline
+    runs. A fingerprint only proves what this code last wrote, not what the page holds now, so it is
+    trusted for MAX_AGE at most; after that the value is written again even if it hasn't changed.
+    """
+    MAX_AGE = timedelta(hours=6)
+
+    def __init__(self, disk_cache: NotionDiskCache = None, max_age: timedelta = MAX_AGE):
+        self._disk_cache = disk_cache
+        self.max_age = max_age
+        self._fingerprints: Dict[str, Dict[str, Tuple[str, float]]] = {}  # page -> property -> (hash, recorded at)
+
+    @staticmethod
+    def fingerprint(value) -> str:
+        payload = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _page_fingerprints(self, page_id: str) -> Dict[str, Tuple[str, float]]:
+        page_id = NotionCache.normalize_id(page_id)
+        if page_id not in self._fingerprints:
+            self._fingerprints[page_id] = self._disk_cache.get_fingerprints(page_id) if self._disk_cache else {}
+        return self._fingerprints[page_id]
+
+    def unchanged(self, page_id: str, properties: dict) -> Set[str]:
+        """Names of the properties that were last written with exactly these values"""
+        if not properties:
+            return set()
+        stored = self._page_fingerprints(page_id)
+        oldest = time.time() - self.max_age.total_seconds()
+        return {name for name, value in properties.items()
+                if name in stored and stored[name][1] >= oldest and stored[name][0] == self.fingerprint(value)}
+
+    def record(self, page_id: str, properties: dict):
+        if not properties:
+            return
+        recorded_at = time.time()
+        fingerprints = {name: (self.fingerprint(value), recorded_at) for name, value in properties.items()}
+        self._page_fingerprints(page_id).update(fingerprints)
+        if self._disk_cache is not None:
+            self._disk_cache.set_fingerprints(page_id, fingerprints)
+
+    def forget(self, page_id: str, property_names: Iterable[str]):
+        property_names = list(property_names)
+        if not property_names:
+            return
+        stored = self._page_fingerprints(page_id)
+        for name in property_names:
+            stored.pop(name, None)
+        if self._disk_cache is not None:
+            self._disk_cache.delete_fingerprints(page_id, property_names)
@@ -0,0 +1,58 @@
+from typing import Dict, Iterable, List
+
+
+class NotionReferenceIndex:
+    """
+    Exact-match title -> pages map over one small Notion database.
+
+    Titles are compared after collapsing whitespace and ignoring case, so "Week 1" no longer matches
+    "Week 12" the way a `title contains` query does. The trailing "<<" that marks the current
+    week/month/quarter is part of the title: "Week 12<<" finds this year's week, not an older "Week 12"
+    page. Only a title with no exact match falls back to pages that differ from it by that marker.
+    """
+
+    def __init__(self, title_field: str, pages: Iterable[dict] = ()):
+        self.title_field = title_field
+        self._pages_by_title: Dict[str, List[dict]] = {}
+        self._pages_by_unmarked_title: Dict[str, List[dict]] = {}
+        for page in pages:
+            self.add(page)
+
+    @staticmethod
+    def normalize_title(title: str) -> str:
+        return " ".join(title.split()).casefold()
+
+    @classmethod
+    def unmarked_title(cls, title: str) -> str:
+        title = cls.normalize_title(title)
+        if title.endswith("<<"):
+            title = title[:-2].rstrip()
+        return title
+
+    def title_of(self, page: dict) -> str:
+        title_parts = page.get("properties", {}).get(self.title_field, {}).get("title") or []
+        return "".join(part.get("plain_text") or part.get("text", {}).get("content", "") for part in title_parts)
+
+    def add(self, page: dict):
+        title = self.title_of(page)
+        for pages_by_title, key in ((self._pages_by_title, self.normalize_title(title)),
+                                    (self._pages_by_unmarked_title, self.unmarked_title(title))):
+            pages = pages_by_title.setdefault(key, [])
+            pages[:] = [existing for existing in pages if existing["id"] != page["id"]]
+            pages.append(page)
+
+    def remove(self, page_id: str):
+        for pages_by_title in (self._pages_by_title, self._pages_by_unmarked_title):
+            for title, pages in list(pages_by_title.items()):
+                pages[:] = [page for page in pages if page["id"] != page_id]
+                if not pages:
+                    del pages_by_title[title]
+
+    def get(self, title: str) -> List[dict]:
+        exact_matches = self._pages_by_title.get(self.normalize_title(title))
+        if exact_matches:
+            return list(exact_matches)
+        return list(self._pages_by_unmarked_title.get(self.unmarked_title(title), []))
+
+    def __len__(self) -> int:
+        return sum(len(pages) for pages in self._pages_by_title.values())
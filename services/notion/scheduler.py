@@ -0,0 +1,137 @@
+from services.rate_limiter import TokenBucket
+
+from notion_client.errors import RequestTimeoutError
+from typing import Any, Callable
+import asyncio
+import random
+import threading
+import time
+
+
+class NotionRequestScheduler:
+    """
+    Paces every Notion API call for the integration and retries the ones that get rate limited.
+
+    A token bucket keeps the request rate at Notion's documented average of 3 requests per second, with
+    a small burst allowance. Reads go ahead of writes: a write waits while any read is waiting for a token.
+    A 429 / rate_limited response pauses every caller for the Retry-After the API asked for, plus jitter,
+    and the request is retried. Reads are also retried on timeouts and 5xx responses; writes are not,
+    because the API may already have applied them.
+
+    One scheduler is shared by every Notion service in the process, since the limit is per integration.
+    """
+    REQUESTS_PER_SECOND = 3.0
+    BURST = 3
+    MAX_RETRIES = 5
+    BASE_BACKOFF = 1.0  # seconds, doubled on every retry without a Retry-After
+    MAX_BACKOFF = 30.0
+
+    READ = "read"
+    WRITE = "write"
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, requests_per_second: float = REQUESTS_PER_SECOND, burst: int = BURST,
+                 max_retries: int = MAX_RETRIES):
+        self._bucket = TokenBucket(requests_per_second, burst)
+        self.max_retries = max_retries
+        self._condition = threading.Condition()
+        self._waiting_reads = 0
+        self._paused_until = 0.0
+
+        self.requests = 0
+        self.retries = 0
+        self.seconds_waited = 0.0
+
+    @classmethod
+    def shared(cls) -> "NotionRequestScheduler":
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def acquire(self, priority: str = READ):
+        """Block until this request may be sent"""
+        started = time.monotonic()
+        with self._condition:
+            if priority == self.READ:
+                self._waiting_reads += 1
+            try:
+                while True:
+                    if priority == self.WRITE and self._waiting_reads:
+                        self._condition.wait(0.05)
+                        continue
+                    delay = max(self._paused_until - time.monotonic(), self._bucket.time_until_available())
+                    if delay <= 0 and self._bucket.try_take():
+                        break
+                    self._condition.wait(max(delay, 0.01))
+            finally:
+                if priority == self.READ:
+                    self._waiting_reads -= 1
+                self._condition.notify_all()
+        self.requests += 1
+        self.seconds_waited += time.monotonic() - started
+
+    def pause(self, seconds: float):
+        """Hold back every caller, e.g. after the API answered 429"""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+    def call(self, endpoint: Callable[..., Any], priority: str = READ, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            self.acquire(priority)
+            try:
+                return endpoint(**kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, priority, attempt)
+                if delay is None:
+                    raise
+                self._before_retry(e, delay)
+                attempt += 1
+
+    async def call_async(self, endpoint: Callable[..., Any], priority: str = READ, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            await asyncio.to_thread(self.acquire, priority)
+            try:
+                return await endpoint(**kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, priority, attempt)
+                if delay is None:
+                    raise
+                self._before_retry(e, delay)
+                attempt += 1
+
+    def _before_retry(self, error: Exception, delay: float):
+        self.retries += 1
+        print(f"Notion request failed ({error}), retrying in {delay:.1f}s")
+        self.pause(delay)
+
+    def _retry_delay(self, error: Exception, priority: str, attempt: int) -> float | None:
+        """Seconds to wait before retrying, or None if the error shouldn't be retried"""
+        if attempt >= self.max_retries:
+            return None
+
+        status = getattr(error, "status", None)
+        code = getattr(error, "code", None)
+        rate_limited = status == 429 or code == "rate_limited"
+        transient = isinstance(error, RequestTimeoutError) or (status is not None and status >= 500)
+        if not rate_limited and not (transient and priority == self.READ):
+            return None
+
+        backoff = min(self.BASE_BACKOFF * 2 ** attempt, self.MAX_BACKOFF)
+        headers = getattr(error, "headers", None) or {}
+        retry_after = headers.get("retry-after") or headers.get("Retry-After")
+        if retry_after:
+            try:
+                backoff = float(retry_after)
+            except ValueError:
+                pass
+        return backoff + random.uniform(0, backoff / 4 + 0.25)
+
+    @property
+    def stats(self) -> dict:
+        return {"requests": self.requests, "retries": self.retries, "seconds_waited": round(self.seconds_waited, 2)}
@@ -1,9 +1,21 @@
-from data_models.task import Task
+from data_models.task import LazyTask, Task
 from services.notion.database_specific import NotionDatabaseSpecific
 
+from typing import Dict, List
 from urllib.parse import unquote
 
 class NotionTransformer(NotionDatabaseSpecific):
+    # Task fields filled from the titles of related pages, and the Notion property each one comes from
+    TASK_RELATION_PROPERTIES = {
+        "depends_on": "Dependent On",
+        "project": "Projects",
+        "subcategory": "Value Goals",
+        "pillar": "Pillar",
+        "goal": "Goal Outcome",
+        "planned_week": "Planned Week",
+        "planned_month": "Planned Month",
+        "planned_quarter": "Planned Quarter",
+    }
 
     @staticmethod
     def _extract_title_from_url(notion_url: str) -> str:
@@ -16,6 +28,57 @@ class NotionTransformer(NotionDatabaseSpecific):
         # Replace remaining hyphens with spaces
         return title.replace('-', ' ')
 
+    def _get_relation_titles(self, page_ids: List[str]) -> Dict[str, str]:
+        titles = {}
+        for page_id in page_ids:
+            item_page = self._get_page_by_id(page_id)
+            titles[page_id] = self._extract_title_from_url(item_page["url"])
+        return titles
+
+    def _get_task_relation_databases(self) -> Dict[str, str]:
+        """Notion task property -> ID of the database its related pages live in"""
+        return {
+            "Dependent On": self.tasks_database_id,
+            "Projects": self.project_database_id,
+            "Value Goals": self.value_goal_database_id,
+            "Pillar": self.pillar_database_id,
+            "Goal Outcome": self.goal_outcome_database_id,
+            "Planned Week": self.week_database_id,
+            "Planned Month": self.month_database_id,
+            "Planned Quarter": self.quarter_database_id,
+            "Sub-item": self.tasks_database_id,
+        }
+
+    def _prefetch_relation_pages(self, task_pages: List[dict]):
+        """Fetch every page related to a batch of task pages up front, each distinct page once"""
+        relation_databases = self._get_task_relation_databases()
+        page_ids_by_database = {}
+        for page in task_pages:
+            for property_name, database_id in relation_databases.items():
+                for item in page["properties"][property_name]["relation"]:
+                    page_ids_by_database.setdefault(database_id, set()).add(item["id"])
+        self._prefetch_pages(page_ids_by_database)
+
+    def _convert_task_responses_to_dtos(self, task_pages: List[dict]) -> List[Task]:
+        self._prefetch_relation_pages(task_pages)
+        return [self._convert_task_response_to_dto(page) for page in task_pages]
+
+    def _resolve_task_relations(self, tasks: List[Task]):
+        """Resolve the pending relation titles of many lazy tasks, fetching each related page once"""
+        lazy_tasks = [task for task in tasks if isinstance(task, LazyTask)]
+        relation_databases = self._get_task_relation_databases()
+        page_ids_by_database = {}
+        for task in lazy_tasks:
+            for field_name, page_ids in task.pending_relations.items():
+                database_id = relation_databases[self.TASK_RELATION_PROPERTIES[field_name]]
+                page_ids_by_database.setdefault(database_id, set()).update(page_ids)
+        self._prefetch_pages(page_ids_by_database)
+
+        page_ids = list(dict.fromkeys(page_id for page_ids in page_ids_by_database.values() for page_id in page_ids))
+        titles = self._get_relation_titles(page_ids)
+        for task in lazy_tasks:
+            task.fill_relation_titles(titles)
+
     def _add_depends_on_title_to_response(self, dependent_on_json: dict):
         for item in dependent_on_json["relation"]:
             item_page = self._get_page_by_id(item["id"])
@@ -79,7 +142,10 @@ class NotionTransformer(NotionDatabaseSpecific):
             mood_str = "😫Awful"
         return mood_str
 
-    def _convert_task_response_to_dto(self, task_response: dict):
+    def _convert_task_response_to_dto(self, task_response: dict, lazy: bool = False):
+        if lazy:
+            return self._convert_task_response_to_lazy_dto(task_response)
+
         if task_response["properties"]["Dependent On"]["relation"]:
             task_response["properties"]["Dependent On"] = self._add_depends_on_title_to_response(task_response["properties"]["Dependent On"])
 
@@ -115,3 +181,14 @@ class NotionTransformer(NotionDatabaseSpecific):
 
         return Task.from_notion_json(task_response)
 
+    def _convert_task_response_to_lazy_dto(self, task_response: dict) -> LazyTask:
+        """
+        Convert a task page without fetching any related page. Relation titles are looked up when a field
+        is first read, or for a whole list of tasks at once with _resolve_task_relations.
+        """
+        task = LazyTask.from_notion_json(task_response)
+        for field_name, property_name in self.TASK_RELATION_PROPERTIES.items():
+            relation = task_response["properties"][property_name]["relation"]
+            if relation:
+                task.defer_relation(field_name, [item["id"] for item in relation], self._get_relation_titles)
+        return task
@@ -0,0 +1,169 @@
+from typing import Any, Callable
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens are added per second up to `capacity`, and each request takes one.
+
+    Requests under budget go through immediately; once the bucket is empty, callers wait only as long as
+    it takes for the next token to arrive. Thread-safe.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def time_until_available(self) -> float:
+        """Seconds until a token can be taken, 0 if one is available now"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def try_take(self) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def take(self) -> float:
+        """Block until a token is available and take it. Returns the seconds spent waiting"""
+        waited = 0.0
+        while not self.try_take():
+            delay = self.time_until_available()
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+
+class AdaptiveRateLimiter:
+    """
+    Paces calls to one endpoint and adapts to its 429 responses (additive increase, multiplicative decrease).
+
+    Calls go through a token bucket, so anything under budget runs without delay. A rate-limited
+    response halves the rate, waits out its Retry-After (or a backoff) and retries the call; every
+    SUCCESSES_PER_STEP successful calls after that raise the rate by `step` again, up to `max_rate`.
+    Thread-safe, so one limiter can be shared by every client of the endpoint.
+    """
+    SUCCESSES_PER_STEP = 10
+    MAX_RETRIES = 4
+
+    def __init__(self, name: str, rate: float, burst: float = 1, min_rate: float = None, step: float = None,
+                 max_retries: int = MAX_RETRIES):
+        self.name = name
+        self.max_rate = rate
+        self.min_rate = min_rate or rate / 8
+        self.step = step or rate / 10
+        self.max_retries = max_retries
+        self._bucket = TokenBucket(rate, burst)
+        self._lock = threading.Lock()
+        self._successes = 0
+        self._paused_until = 0.0
+
+        self.calls = 0
+        self.rate_limited = 0
+        self.seconds_waited = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self._bucket.rate
+
+    def wait(self):
+        """Block until the next call may be sent"""
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+            self.seconds_waited += pause
+        self.seconds_waited += self._bucket.take()
+        self.calls += 1
+
+    def on_success(self):
+        with self._lock:
+            if self.rate >= self.max_rate:
+                return
+            self._successes += 1
+            if self._successes >= self.SUCCESSES_PER_STEP:
+                self._successes = 0
+                self._bucket.set_rate(min(self.max_rate, self.rate + self.step))
+
+    def on_rate_limited(self, retry_after: float = None) -> float:
+        """Slow down after a 429 and return how long to wait before retrying"""
+        with self._lock:
+            self.rate_limited += 1
+            self._successes = 0
+            self._bucket.set_rate(max(self.min_rate, self.rate / 2))
+            delay = retry_after if retry_after is not None else 1 / self.rate
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        print(f"{self.name} rate limited, slowing to {self.rate:.2f} requests/s and pausing {delay:.1f}s")
+        return delay
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run func once it is within budget, retrying it while the endpoint answers 429. If it still does
+        after max_retries, the 429 is raised (an HTTPError for a requests response) rather than returned.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.wait()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                retry_after = _rate_limit_retry_after(e)
+                if retry_after is False:
+                    raise
+                self.on_rate_limited(retry_after)
+                if attempt == self.max_retries:
+                    raise
+                continue
+            retry_after = _rate_limit_retry_after(result)
+            if retry_after is False:
+                self.on_success()
+                return result
+            self.on_rate_limited(retry_after)
+            if attempt == self.max_retries:
+                raise_for_status = getattr(result, "raise_for_status", None)
+                if raise_for_status is not None:
+                    raise_for_status()
+                raise RuntimeError(f"{self.name} still rate limited after {self.max_retries} retries")
+
+    @property
+    def stats(self) -> dict:
+        return {"calls": self.calls, "rate_limited": self.rate_limited, "rate": round(self.rate, 3),
+                "seconds_waited": round(self.seconds_waited, 2)}
+
+
+def _rate_limit_retry_after(outcome: Any) -> float | None | bool:
+    """
+    For a response or exception: False if it isn't a 429, otherwise its Retry-After in seconds (None
+    when it doesn't say). Understands requests responses/HTTPErrors and couchdb-python errors.
+    """
+    response = getattr(outcome, "response", None) if isinstance(outcome, Exception) else outcome
+    status = getattr(response, "status_code", None)
+    headers = getattr(response, "headers", None) or {}
+    if status is None and isinstance(outcome, Exception) and outcome.args:
+        # couchdb.http.ServerError carries (status, reason) as its first argument
+        first = outcome.args[0]
+        if isinstance(first, tuple) and first:
+            status = first[0]
+    if status != 429:
+        return False
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,56 @@
+from typing import Any
+import json
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; writes are still atomic, just not serialized between runs
+    fcntl = None
+
+
+class SyncStateStore:
+    """
+    Small JSON file of named sync cursors (Notion watermarks, CouchDB change sequences) shared by the
+    pipelines.
+
+    A cursor is only written once the sync it covers has succeeded, so a failed run is simply redone by
+    the next one. Each write re-reads the file under a lock and replaces it atomically, so overlapping
+    runs neither corrupt the file nor drop each other's cursors.
+    """
+    DEFAULT_PATH = "sync_state.json"
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv("SYNC_STATE_PATH") or self.DEFAULT_PATH
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path) as state_file:
+                return json.load(state_file)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            print(f"Ignoring unreadable sync state in {self.path}")
+            return {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._read().get(key, default)
+
+    def set(self, key: str, value: Any):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".lock", "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            state = self._read()
+            state[key] = value
+            file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(file_descriptor, "w") as temp_file:
+                    json.dump(state, temp_file, indent=2, sort_keys=True)
+                    temp_file.flush()
+                    os.fsync(temp_file.fileno())
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise